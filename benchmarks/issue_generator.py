@@ -0,0 +1,114 @@
+import random
+from datetime import datetime, timedelta
+
+from jiralib.jira_issue_wrapper import open_statuses, dev_statuses, qa_statuses, closed_statuses
+
+jira_datetime_format = '%Y-%m-%dT%H:%M:%S.000+0000'
+
+link_types = [('relates to', 'relates to'), ('depend from', 'depend to'), ('Is part of', 'Encorporates')]
+issue_types = ['Story', 'Story', 'Story', 'Task', 'Bug']
+testing_statuses = [status for status in qa_statuses if status not in closed_statuses]
+
+
+def generate_user(generator, assignees):
+    return {'name': 'user' + str(generator.randrange(assignees)), 'displayName': 'User'}
+
+
+def next_status(generator, status):
+    # open -> dev -> qa -> closed, qa sends some issues back to dev and some closed issues are reopened
+    if status in open_statuses:
+        return generator.choice(dev_statuses) if generator.random() < 0.9 else generator.choice(open_statuses)
+    if status in dev_statuses:
+        return generator.choice(testing_statuses) if generator.random() < 0.8 else 'Code Review'
+    if status == 'Code Review':
+        return generator.choice(testing_statuses)
+    if status in testing_statuses:
+        return generator.choice(dev_statuses) if generator.random() < 0.2 else generator.choice(closed_statuses)
+    return 'Reopened'
+
+
+def generate_histories(generator, created, assignees, max_steps):
+    histories = []
+    status = generator.choice(open_statuses)
+    moment = created
+    for _ in range(generator.randint(0, max_steps)):
+        moment += timedelta(minutes=generator.randint(30, 4 * 24 * 60))
+        items = []
+        if generator.random() < 0.3:
+            user = generate_user(generator, assignees)
+            items.append({'field': 'assignee', 'fieldtype': 'jira', 'from': None, 'fromString': None,
+                          'to': user['name'], 'toString': user['displayName']})
+        if generator.random() < 0.85:
+            status_to = next_status(generator, status)
+            items.append({'field': 'status', 'fieldtype': 'jira', 'from': '1', 'fromString': status,
+                          'to': '2', 'toString': status_to})
+            status = status_to
+        else:
+            items.append({'field': 'labels', 'fieldtype': 'jira', 'fromString': '', 'toString': 'benchmark'})
+        histories.append({'id': str(len(histories)), 'created': moment.strftime(jira_datetime_format), 'items': items})
+        if status in closed_statuses and generator.random() < 0.85:
+            break
+    return (histories, status, moment)
+
+
+def generate_issue(number, generator, project_key='BENCH', assignees=20, max_steps=12, start=datetime(2020, 1, 1),
+                   issues_amount=1000):
+    created = start + timedelta(minutes=generator.randint(0, 365 * 24 * 60))
+    (histories, status, updated) = generate_histories(generator, created, assignees, max_steps)
+    story_points = generator.choice([None, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0])
+    original_estimate = generator.choice([None, 4 * 3600, 8 * 3600, 16 * 3600, 40 * 3600])
+
+    def other_key():
+        return project_key + '-' + str(generator.randrange(issues_amount))
+
+    issue_links = []
+    for _ in range(generator.choice([0, 0, 0, 1, 1, 2, 3])):
+        (inward, outward) = generator.choice(link_types)
+        direction = generator.choice(['inwardIssue', 'outwardIssue'])
+        issue_links.append({'id': str(generator.randrange(10 ** 6)), 'type': {'name': outward, 'inward': inward, 'outward': outward},
+                            direction: {'id': str(generator.randrange(10 ** 6)), 'key': other_key()}})
+    return {
+        'id': str(10000 + number),
+        'key': project_key + '-' + str(number),
+        'fields': {
+            'summary': 'Benchmark issue ' + str(number),
+            'description': 'Generated issue',
+            'status': {'name': status, 'statusCategory': {
+                'colorName': 'green' if status in closed_statuses else 'blue-gray' if status in open_statuses else 'yellow'}},
+            'assignee': generate_user(generator, assignees) if generator.random() < 0.9 else None,
+            'customfield_12000': generate_user(generator, assignees) if generator.random() < 0.1 else None,
+            'customfield_11000': generate_user(generator, assignees) if generator.random() < 0.3 else None,
+            'issuetype': {'name': generator.choice(issue_types)},
+            'project': {'key': project_key, 'name': project_key.title()},
+            'priority': {'name': generator.choice(['Minor', 'Major', 'Critical'])},
+            'customfield_10002': story_points,
+            'aggregatetimeestimate': original_estimate,
+            'aggregatetimeoriginalestimate': original_estimate,
+            'progress': {'progress': 0, 'total': original_estimate or 0},
+            'issuelinks': issue_links,
+            'subtasks': [{'id': str(generator.randrange(10 ** 6)), 'key': other_key()}
+                         for _ in range(generator.choice([0, 0, 0, 0, 1, 2]))],
+            'duedate': (created + timedelta(days=generator.randint(5, 60))).strftime('%Y-%m-%d') if generator.random() < 0.3 else None,
+            'resolutiondate': updated.strftime(jira_datetime_format) if status in closed_statuses else None,
+            'created': created.strftime(jira_datetime_format),
+            'updated': updated.strftime(jira_datetime_format),
+        },
+        'changelog': {'startAt': 0, 'maxResults': len(histories), 'total': len(histories), 'histories': histories},
+    }
+
+
+def generate_issues(amount, seed=1, project_key='BENCH', assignees=20, max_steps=12):
+    """
+    Raw search result issues with a workflow shaped changelog, the same seed gives the same issues.
+    """
+    generator = random.Random(seed)
+    return (generate_issue(number, generator, project_key, assignees, max_steps, issues_amount=amount)
+            for number in range(amount))
+
+
+def generate_sprint(days_passed=6, days_total=10):
+    start_date = datetime.now() - timedelta(days=days_passed * 7 // 5)
+    end_date = start_date + timedelta(days=days_total * 7 // 5)
+    return {'id': 1, 'name': 'Benchmark sprint', 'originBoardId': 1,
+            'startDate': start_date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'endDate': end_date.strftime('%Y-%m-%dT%H:%M:%S.000Z')}
@@ -0,0 +1,103 @@
+import random
+import sys
+import timeit
+from functools import reduce
+
+from benchmarks.issue_generator import generate_sprint
+from jiralib.jira_issue_wrapper import wrap_issues, open_statuses, closed_statuses, dev_statuses, qa_statuses
+from jiralib.sprint import Sprint, build_snapshot, validation_rules
+
+# python -m benchmarks.sprint_benchmark [issues per sprint...]
+
+statuses = open_statuses + closed_statuses + dev_statuses + qa_statuses
+
+
+def generate_sprint_issues(amount, seed=1):
+    generator = random.Random(seed)
+    return wrap_issues({
+        'key': 'BENCH-' + str(number),
+        'id': str(number),
+        'fields': {
+            'status': {'name': generator.choice(statuses), 'statusCategory': {'colorName': 'blue-gray'}},
+            'issuetype': {'name': generator.choice(['Story', 'Task', 'Bug'])},
+            'customfield_10002': generator.choice([None, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0]),
+        }
+    } for number in range(amount))
+
+
+class FilteringSprint:
+    """Sprint statistics the way they were computed before snapshots: status filters on every call."""
+
+    def __init__(self, sprint):
+        self.sprint_issues = sprint.sprint_issues
+        self.days_passed = sprint.days_passed
+        self.days_remaining = sprint.days_remaining
+
+    def get_done_issues(self):
+        return list(filter(lambda issue: issue.is_done(), self.sprint_issues))
+
+    def get_open_issues(self):
+        return list(filter(lambda issue: issue.is_open(), self.sprint_issues))
+
+    def get_in_progress_issues(self):
+        return list(filter(lambda issue: not issue.is_open() and not issue.is_done(), self.sprint_issues))
+
+    def get_not_estimated_issues(self):
+        return list(filter(lambda issue: not issue.is_estimated() and not issue.is_done(), self.sprint_issues))
+
+    def done_sp(self):
+        return reduce(lambda a, b: a + b, map(lambda task: task.get_story_points() or 0, self.get_done_issues()), 0)
+
+    def in_progress_sp(self):
+        return reduce(lambda a, b: a + b, map(lambda task: task.get_story_points() or 0, self.get_in_progress_issues()), 0)
+
+    def open_sp(self):
+        return reduce(lambda a, b: a + b, map(lambda task: task.get_story_points() or 0, self.get_open_issues()), 0)
+
+    def total_sp(self):
+        return self.open_sp() + self.in_progress_sp() + self.done_sp()
+
+    feature_freeze = Sprint.feature_freeze
+    mid_sprint = Sprint.mid_sprint
+    early_sprint = Sprint.early_sprint
+
+
+filtering_rules = [
+    lambda sprint: sprint.days_remaining < 0,
+    lambda sprint: sprint.total_sp() > sprint.done_sp() and sprint.days_remaining <= 0,
+    lambda sprint: len(sprint.get_not_estimated_issues()) > 0,
+    lambda sprint: sprint.early_sprint() and sprint.open_sp() > sprint.total_sp() * 0.50,
+    lambda sprint: sprint.early_sprint() and len(list(filter(lambda task: (task.get_story_points() or 0) >= 8, sprint.get_open_issues()))) > 0,
+    lambda sprint: sprint.mid_sprint() and sprint.open_sp() > sprint.total_sp() * 0.25,
+    lambda sprint: sprint.mid_sprint() and len(list(filter(lambda task: (task.get_story_points() or 0) >= 5, sprint.get_open_issues()))) > 0,
+    lambda sprint: sprint.feature_freeze() and sprint.open_sp() > 0,
+    lambda sprint: sprint.feature_freeze() and sprint.done_sp() < sprint.total_sp() * 0.50,
+]
+
+
+def filtering_alerts(sprint):
+    # alerts for stdout and html alerts both evaluated every rule
+    return [list(filter(lambda rule: rule(sprint), filtering_rules)) for _ in range(2)]
+
+
+def snapshot_alerts(sprint):
+    sprint.snapshot = build_snapshot(sprint.sprint_issues)
+    sprint.triggered_rules = sprint._evaluate_rules()
+    return [sprint._calculate_alerts(), sprint.get_html_alerts()]
+
+
+def run(sizes, repeat=5):
+    print('issues'.rjust(10) + 'filtering, ms'.rjust(16) + 'snapshot, ms'.rjust(16) + 'speedup'.rjust(10))
+    for size in sizes:
+        sprint = Sprint(generate_sprint(), 'Benchmark', generate_sprint_issues(size))
+        filtering_sprint = FilteringSprint(sprint)
+        assert list(map(filtering_rules.index, filtering_alerts(filtering_sprint)[0])) == list(
+            map(lambda rule: validation_rules.index(rule), sprint.triggered_rules))
+        filtering_time = min(timeit.repeat(lambda: filtering_alerts(filtering_sprint), number=1, repeat=repeat))
+        snapshot_time = min(timeit.repeat(lambda: snapshot_alerts(sprint), number=1, repeat=repeat))
+        print(str(size).rjust(10) + ('%.2f' % (filtering_time * 1000)).rjust(16) +
+              ('%.2f' % (snapshot_time * 1000)).rjust(16) + ('%.1fx' % (filtering_time / snapshot_time)).rjust(10))
+
+
+if __name__ == '__main__':
+    run(list(map(int, sys.argv[1:])) or [1000, 5000, 20000])
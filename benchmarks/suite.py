@@ -0,0 +1,108 @@
+import argparse
+import json
+import time
+import timeit
+
+from benchmarks.issue_generator import generate_issues, generate_sprint
+from jiralib.capacity_calculator import collect_tasks, filter_not_enough_stats, to_project_statistics
+from jiralib.jira_issue_wrapper import wrap_issues
+from jiralib.pm_calc import Range, get_working_days_from_intervals, merge_timeranges
+from jiralib.sprint import Sprint
+
+# python -m benchmarks.suite [--repeat 3] [--json out/benchmarks.jsonl] [issues...]
+
+metric_getters = ['get_work_start_date', 'get_work_end_date', 'get_open_issue_assignee_name',
+                  'get_actual_working_days_with_gaps', 'get_dev_actual_working_days_with_gaps',
+                  'get_qa_actual_working_days_with_gaps', 'get_actual_working_days_without_gaps',
+                  'get_story_points', 'get_aggregatetimeoriginalestimate', 'get_status', 'is_estimated']
+
+
+def read_metrics(wrapped_issues):
+    for issue in wrapped_issues:
+        for getter in metric_getters:
+            getattr(issue, getter)()
+
+
+warm_cache = {}
+
+
+def warm_wrappers(raw_issues):
+    if id(raw_issues) not in warm_cache:
+        warm_cache.clear()
+        wrapped_issues = wrap_issues(raw_issues)
+        read_metrics(wrapped_issues)
+        warm_cache[id(raw_issues)] = wrapped_issues
+    return warm_cache[id(raw_issues)]
+
+
+def fresh_wrappers(raw_issues):
+    # timelines are cached on the wrapper, every run starts from new wrappers
+    return wrap_issues(raw_issues)
+
+
+def done_issues(wrapped_issues):
+    return [issue for issue in wrapped_issues if issue.is_done() and issue.get_work_start_date() is not None]
+
+
+def capacity_statistics(wrapped_issues):
+    return to_project_statistics(filter_not_enough_stats(collect_tasks(wrapped_issues, True, {})))
+
+
+def work_ranges(wrapped_issues):
+    return [Range(issue.get_work_start_date(), issue.get_work_end_date()) for issue in wrapped_issues]
+
+
+def benchmarks(raw_issues):
+    """
+    (name, setup, measured) triples, setup output is passed to measured and is not timed.
+    """
+    return [
+        ('wrap_issues', lambda: raw_issues, wrap_issues),
+        ('metric getters', lambda: fresh_wrappers(raw_issues), read_metrics),
+        ('metric getters, warm', lambda: warm_wrappers(raw_issues), read_metrics),
+        ('capacity statistics', lambda: done_issues(warm_wrappers(raw_issues)), capacity_statistics),
+        ('sprint rules', lambda: warm_wrappers(raw_issues),
+         lambda wrapped_issues: Sprint(generate_sprint(), 'Benchmark', wrapped_issues)),
+        ('merge_timeranges', lambda: work_ranges(done_issues(warm_wrappers(raw_issues))),
+         lambda ranges: merge_timeranges(list(ranges))),
+        ('get_working_days_from_intervals', lambda: work_ranges(done_issues(warm_wrappers(raw_issues))),
+         lambda ranges: get_working_days_from_intervals(list(ranges))),
+    ]
+
+
+def measure(setup, measured, repeat):
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        started = timeit.default_timer()
+        measured(argument)
+        timings.append(timeit.default_timer() - started)
+    return min(timings)
+
+
+def run(sizes, repeat=3, json_file=None):
+    results = {}
+    print('benchmark'.ljust(34) + ''.join(map(lambda size: (str(size) + ' issues, ms').rjust(20), sizes)))
+    for size in sizes:
+        raw_issues = list(generate_issues(size))
+        for (name, setup, measured) in benchmarks(raw_issues):
+            results.setdefault(name, {})[size] = measure(setup, measured, repeat)
+        warm_cache.clear()
+    for (name, timings) in results.items():
+        print(name.ljust(34) + ''.join(map(lambda size: ('%.1f' % (timings[size] * 1000)).rjust(20), sizes)))
+    if json_file:
+        # one line per run, compare with earlier lines to spot regressions
+        with open(json_file, mode='a', encoding='utf-8') as results_file:
+            results_file.write(json.dumps({'time': time.time(), 'repeat': repeat, 'results': {
+                name: {str(size): seconds for (size, seconds) in timings.items()} for (name, timings) in results.items()
+            }}) + '\n')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline jiralib benchmarks on generated issues')
+    parser.add_argument('sizes', type=int, nargs='*', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', dest='json_file')
+    arguments = parser.parse_args()
+    run(arguments.sizes, arguments.repeat, arguments.json_file)
@@ -1,4 +1,6 @@
 from jiralib.capacity_calculator import CapacityCalculator
 
+# nightly job: rebuilds the stored capacity model, exports started later reuse it until it expires
 capacity_calculator = CapacityCalculator()
-capacity_calculator.get_project_capacity('CFD')
\ No newline at end of file
+capacity_calculator.refresh_project('CFD')
+capacity_calculator.print_capacity('CFD')
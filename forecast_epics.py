@@ -0,0 +1,6 @@
+from jiralib.forecast import DeliveryForecaster, Forecast
+from jiralib.namedtuple_printer import write_csv
+
+# nightly job: P50/P85/P95 delivery dates of every open epic
+forecaster = DeliveryForecaster()
+write_csv('CFD_forecast.csv', Forecast, forecaster.forecast_open_epics('CFD'))
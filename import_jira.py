@@ -1,23 +1,12 @@
-import jira_connector
 import sys
 
-from jiralib.csv_reader import read_csv
-
-jira = jira_connector.jira
-
-
-def create_story(issue_tuple):
-    issue_dict = {
-        'issuetype': {'name': 'Story'},
-    }
-    result_dict = {**dict(issue_tuple._asdict()), **issue_dict}
-    return jira.create_issue(fields=result_dict)
-
+import jira_connector
+from jiralib.bulk_import import import_issues, print_import_stats, to_story_fields
 
 issues_csv_file = sys.argv[1]
-issues_content = read_csv(issues_csv_file)
-for issue_content in issues_content:
-    create_story(issue_content)
+# created rows are remembered in <csv>.checkpoint, rerun the import to retry failed rows only
+stats = import_issues(issues_csv_file, to_story_fields)
+print_import_stats(stats)
+jira_connector.print_scheduler_stats()
 
 print('done!')
-
@@ -1,8 +1,14 @@
 from jira import JIRA
 import configparser
+import threading
+from datetime import datetime
 
 from jira.resources import GreenHopperResource
 
+from jiralib import pm_calc, profiling
+from jiralib.http_session import AdaptiveLimit, CachingSession, ProfilingSession, RecordingSession, ReplaySession, \
+    ThrottledSession, default_cache_rules
+
 settings = configparser.ConfigParser()
 settings._interpolation = configparser.ExtendedInterpolation()
 settings.read('jira.ini')
@@ -11,5 +17,91 @@ base_url = settings.get("common", "base_url")
 login = settings.get("credentials", "login")
 password = settings.get("credentials", "password")
 
+# live - talk to jira, record - talk to jira and store responses in fixtures, replay - answer from fixtures only
+connector_mode = settings.get("connector", "mode", fallback='live')
+fixtures_file = settings.get("connector", "fixtures", fallback='fixtures/jira.zip')
+
+# metadata answers (boards, sprint lists, fields...) kept on disk, ttl minutes per rule can be set by rule name
+http_cache_enabled = settings.getboolean("http_cache", "enabled", fallback=False)
+http_cache_folder = settings.get("http_cache", "folder", fallback='cache/http')
+http_cache_rules = list(map(
+    lambda rule: rule._replace(ttl_minutes=float(settings.get("http_cache", rule.name, fallback=str(rule.ttl_minutes)))),
+    default_cache_rules))
+
+# retries of throttled requests and an adaptive concurrency limit shared by every thread of the client
+scheduler_enabled = settings.getboolean("scheduler", "enabled", fallback=False)
+scheduler_limit = AdaptiveLimit(int(settings.get("scheduler", "initial_concurrency", fallback='4')),
+                                int(settings.get("scheduler", "min_concurrency", fallback='1')),
+                                int(settings.get("scheduler", "max_concurrency", fallback='16')),
+                                float(settings.get("scheduler", "slow_latency_factor", fallback='3')))
+scheduler_max_retries = int(settings.get("scheduler", "max_retries", fallback='6'))
+scheduler_backoff = float(settings.get("scheduler", "backoff_seconds", fallback='0.5'))
+scheduler_max_backoff = float(settings.get("scheduler", "max_backoff_seconds", fallback='60'))
+
+holidays = settings.get("calendar", "holidays", fallback='').replace(',', ' ').split()
+pm_calc.set_holidays(map(lambda holiday: datetime.strptime(holiday, '%Y-%m-%d').date(), holidays))
+
 jira_options = {'server': base_url, 'agile_rest_path': GreenHopperResource.AGILE_BASE_REST_PATH }
-jira = JIRA(options=jira_options, basic_auth=(login, password))
+
+
+http_cache = None
+scheduler = None
+
+
+def layer_session(session):
+    global http_cache, scheduler
+    if scheduler_enabled and connector_mode != 'replay':
+        session = scheduler = ThrottledSession(session, scheduler_limit, scheduler_max_retries, scheduler_backoff,
+                                               scheduler_max_backoff)
+    # replayed answers never reach jira, there is nothing to cache
+    if http_cache_enabled and connector_mode != 'replay':
+        session = http_cache = CachingSession(session, http_cache_folder, base_url, http_cache_rules)
+    if connector_mode == 'record':
+        session = RecordingSession(session, fixtures_file, base_url)
+    if connector_mode == 'replay':
+        session = ReplaySession(session, fixtures_file, base_url)
+    if profiling.enabled:
+        session = ProfilingSession(session, base_url)
+    return session
+
+
+class ConnectorJIRA(JIRA):
+    # the session is wrapped as soon as it is created, jira client constructor already sends requests
+    def _create_http_basic_session(self, *args, **kwargs):
+        super()._create_http_basic_session(*args, **kwargs)
+        self._session = layer_session(self._session)
+
+
+_jira = None
+_jira_lock = threading.Lock()
+
+
+def get_jira():
+    global _jira
+    with _jira_lock:
+        if _jira is None:
+            # with the scheduler on, retries are left to it
+            _jira = ConnectorJIRA(options=jira_options, basic_auth=(login, password),
+                                  max_retries=0 if scheduler_enabled else 3)
+    return _jira
+
+
+def print_scheduler_stats():
+    if scheduler is not None:
+        stats = scheduler.stats()
+        print('Requests: ' + str(stats.requests) + ', retries: ' + str(stats.retries) + ', overloaded answers: '
+              + str(stats.overloaded) + ', concurrency: ' + str(stats.concurrency))
+
+
+def print_http_cache_stats():
+    if http_cache is not None:
+        stats = http_cache.stats()
+        print('HTTP cache: ' + str(stats.hits) + ' hits, ' + str(stats.revalidated) + ' revalidated, '
+              + str(stats.misses) + ' misses')
+
+
+def __getattr__(name):
+    # the client is created on first use, so importing jiralib does not need a reachable jira
+    if name == 'jira':
+        return get_jira()
+    raise AttributeError("module '" + __name__ + "' has no attribute '" + name + "'")
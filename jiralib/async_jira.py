@@ -0,0 +1,99 @@
+import asyncio
+
+import aiohttp
+from jira.exceptions import JIRAError
+
+import jira_connector
+
+api_path = '/rest/api/2/'
+agile_path = '/rest/agile/1.0/'
+async_connections = int(jira_connector.settings.get("connector", "async_connections", fallback='8'))
+async_timeout = float(jira_connector.settings.get("connector", "async_timeout_seconds", fallback='120'))
+
+
+class AsyncJira:
+    """
+    Minimal asyncio Jira REST client for the read heavy paths: one pooled aiohttp session, at most max_connections
+    requests in flight. Answers are raw json, like the search results of the blocking client used with json_result.
+    It talks to the server directly, the record and replay modes of jira_connector only cover the blocking client.
+
+        async with AsyncJira() as jira:
+            issues = await jira.search_issues('project = CFD')
+    """
+
+    def __init__(self, server=None, basic_auth=None, max_connections=async_connections, timeout=async_timeout):
+        self.server = (server or jira_connector.base_url).rstrip('/')
+        self.basic_auth = basic_auth or (jira_connector.login, jira_connector.password)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.session = None
+        self.limit = None
+
+    async def __aenter__(self):
+        self.limit = asyncio.Semaphore(self.max_connections)
+        self.session = aiohttp.ClientSession(
+            auth=aiohttp.BasicAuth(*self.basic_auth),
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'Accept': 'application/json'})
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def request(self, method, path, params=None, json=None):
+        url = self.server + path
+        async with self.limit:
+            async with self.session.request(method, url, params=params, json=json) as response:
+                if response.status >= 400:
+                    # same error type as the blocking client, callers handle both alike
+                    raise JIRAError(status_code=response.status, text=await response.text(), url=url)
+                return await response.json(content_type=None)
+
+    async def search_page(self, jql, start_at, max_results, fields=None, expand=None):
+        params = {'jql': jql, 'startAt': start_at, 'maxResults': max_results, 'validateQuery': 'true'}
+        if fields is not None:
+            params['fields'] = fields if isinstance(fields, str) else ','.join(fields)
+        if expand:
+            params['expand'] = expand
+        return await self.request('GET', api_path + 'search', params=params)
+
+    async def search_issues(self, jql, fields=None, expand=None, max_results=100):
+        # the first page tells how many issues match and which page size the server really applied
+        first_page = await self.search_page(jql, 0, max_results, fields, expand)
+        step = first_page['maxResults'] or len(first_page['issues'])
+        if step == 0:
+            return first_page['issues']
+        pages = await asyncio.gather(*map(lambda start_at: self.search_page(jql, start_at, step, fields, expand),
+                                          range(step, first_page['total'], step)))
+        return [issue for page in [first_page, *pages] for issue in page['issues']]
+
+    async def issue(self, key, fields=None, expand=None):
+        params = {}
+        if fields is not None:
+            params['fields'] = fields if isinstance(fields, str) else ','.join(fields)
+        if expand:
+            params['expand'] = expand
+        return await self.request('GET', api_path + 'issue/' + key, params=params)
+
+    async def values(self, path, params=None):
+        # agile resources come in pages of 'values' ended by isLast
+        values = []
+        while True:
+            page = await self.request('GET', path, params={**(params or {}), 'startAt': len(values)})
+            values.extend(page['values'])
+            if page.get('isLast', True) or len(page['values']) == 0:
+                return values
+
+    async def boards(self, board_type='scrum'):
+        return await self.values(agile_path + 'board', {'type': board_type})
+
+    async def sprints(self, board_id, state='active'):
+        return await self.values(agile_path + 'board/' + str(board_id) + '/sprint', {'state': state})
+
+    async def create_issue(self, fields):
+        return await self.request('POST', api_path + 'issue', json={'fields': fields})
+
+    async def create_issues(self, field_list):
+        return await self.request('POST', api_path + 'issue/bulk',
+                                  json={'issueUpdates': list(map(lambda fields: {'fields': fields}, field_list))})
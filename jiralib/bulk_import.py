@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import jira_connector
+from jiralib.csv_reader import iter_csv
+
+batch_size = int(jira_connector.settings.get("import", "batch_size", fallback='50'))
+import_workers = int(jira_connector.settings.get("import", "workers", fallback='4'))
+
+ImportRow = namedtuple('ImportRow', 'number fields')
+BatchResult = namedtuple('BatchResult', 'number rows created failures')
+ImportStats = namedtuple('ImportStats', 'created skipped failed seconds failures')
+
+
+def to_story_fields(issue_tuple):
+    issue_dict = {
+        'issuetype': {'name': 'Story'},
+    }
+    return {**dict(issue_tuple._asdict()), **issue_dict}
+
+
+class Checkpoint:
+    """
+    Rows already created, as 'row number,issue key' lines appended after every batch, so a rerun skips them.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.created = {}
+        if os.path.exists(filename):
+            with open(filename) as checkpoint_file:
+                for line in checkpoint_file:
+                    if ',' in line:
+                        (number, key) = line.strip().split(',', 1)
+                        self.created[int(number)] = key
+
+    def is_created(self, row_number):
+        return row_number in self.created
+
+    def record(self, created_rows):
+        with self.lock:
+            with open(self.filename, mode='a') as checkpoint_file:
+                for (number, key) in created_rows:
+                    checkpoint_file.write(str(number) + ',' + key + '\n')
+                    self.created[number] = key
+
+
+class ProjectIds:
+    # jira resolves a project key with one request per created issue, resolve every key once instead
+    def __init__(self):
+        self.ids = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, fields):
+        project = fields.get('project')
+        if not isinstance(project, str):
+            return fields
+        with self.lock:
+            if project not in self.ids:
+                self.ids[project] = {'id': jira_connector.jira.project(project).id}
+        return {**fields, 'project': self.ids[project]}
+
+
+def create_batch(batch_number, batch, project_ids):
+    try:
+        results = jira_connector.jira.create_issues(
+            list(map(lambda row: project_ids.resolve(row.fields), batch)), prefetch=False)
+    except Exception as error:
+        return BatchResult(batch_number, batch, [], list(map(lambda row: (batch_number, row.number, str(error)), batch)))
+    created = []
+    failures = []
+    for (row, result) in zip(batch, results):
+        if result['status'] == 'Success':
+            created.append((row.number, result['issue'].key))
+        else:
+            failures.append((batch_number, row.number, str(result['error'])))
+    return BatchResult(batch_number, batch, created, failures)
+
+
+def read_rows(csv_file, to_fields):
+    return map(lambda numbered_row: ImportRow(numbered_row[0], to_fields(numbered_row[1])),
+               enumerate(iter_csv(csv_file), start=1))
+
+
+def to_batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+def import_issues(csv_file, to_fields=to_story_fields, checkpoint_file=None):
+    checkpoint = Checkpoint(checkpoint_file or csv_file + '.checkpoint')
+    project_ids = ProjectIds()
+    started = time.monotonic()
+    skipped = 0
+    created = 0
+    failures = []
+
+    def pending_rows():
+        nonlocal skipped
+        for row in read_rows(csv_file, to_fields):
+            if checkpoint.is_created(row.number):
+                skipped += 1
+            else:
+                yield row
+
+    def collect(batch_result):
+        nonlocal created
+        checkpoint.record(batch_result.created)
+        created += len(batch_result.created)
+        failures.extend(batch_result.failures)
+
+    with ThreadPoolExecutor(max_workers=import_workers) as executor:
+        # at most import_workers batches are in flight, the csv is read as batches complete
+        pending = deque()
+        for (batch_number, batch) in enumerate(to_batches(pending_rows(), batch_size), start=1):
+            pending.append(executor.submit(create_batch, batch_number, batch, project_ids))
+            if len(pending) >= import_workers:
+                collect(pending.popleft().result())
+        while pending:
+            collect(pending.popleft().result())
+    return ImportStats(created, skipped, len(failures), time.monotonic() - started, failures)
+
+
+def print_import_stats(stats):
+    print('Created: ' + str(stats.created) + ', skipped: ' + str(stats.skipped) + ', failed: ' + str(stats.failed))
+    print('Time: ' + ('%.1f' % stats.seconds) + 's, ' + ('%.1f' % (stats.created / max(stats.seconds, 0.001))) + ' issues/s')
+    for (batch_number, row_number, error) in stats.failures:
+        print('Batch ' + str(batch_number) + ', row ' + str(row_number) + ' failed: ' + error)
@@ -0,0 +1,76 @@
+import threading
+from datetime import date
+
+import numpy as np
+
+unix_epoch_ordinal = date(1970, 1, 1).toordinal()
+table_margin_days = 366
+
+
+def weekday_of_ordinal(ordinals):
+    # date.fromordinal(1) is a Monday
+    return (ordinals - 1) % 7
+
+
+class BusinessCalendar:
+    """
+    Working days counted the way workdays.networkdays does it: weekdays from the start day to the end day inclusive,
+    minus holidays. Counts are differences of a cumulative table of business days, so a single query is two lookups
+    and the batch query is vectorized in the spirit of numpy.busday_count. The table grows when a date outside of it
+    is asked for.
+    """
+
+    def __init__(self, holidays=(), first_day=date(2015, 1, 1), last_day=date(2030, 12, 31)):
+        self.holidays = np.array(sorted(set(map(lambda holiday: holiday.toordinal(), holidays))), dtype=np.int64)
+        self.lock = threading.Lock()
+        self._build(first_day.toordinal(), last_day.toordinal())
+
+    def _build(self, first_ordinal, last_ordinal):
+        ordinals = np.arange(first_ordinal, last_ordinal + 1, dtype=np.int64)
+        business_days = (weekday_of_ordinal(ordinals) < 5) & ~np.isin(ordinals, self.holidays)
+        table = np.cumsum(business_days)
+        # published as one tuple, readers never see a half rebuilt table
+        self._table = (first_ordinal, last_ordinal, table, table.tolist())
+
+    def _table_for(self, low_ordinal, high_ordinal):
+        table = self._table
+        if table[0] <= low_ordinal and high_ordinal <= table[1]:
+            return table
+        with self.lock:
+            first_ordinal, last_ordinal = self._table[0], self._table[1]
+            if low_ordinal < first_ordinal or last_ordinal < high_ordinal:
+                self._build(min(first_ordinal, low_ordinal - table_margin_days),
+                            max(last_ordinal, high_ordinal + table_margin_days))
+            return self._table
+
+    def working_days(self, fromdate, todate):
+        end_ordinal = todate.toordinal()
+        start_ordinal = end_ordinal - ((todate - fromdate).days + 1)
+        first_ordinal, last_ordinal, table, table_list = self._table_for(start_ordinal, end_ordinal)
+        return table_list[end_ordinal - first_ordinal] - table_list[start_ordinal - first_ordinal]
+
+    def working_days_batch(self, fromdates, todates):
+        fromdates = np.asarray(fromdates, dtype='datetime64[us]')
+        todates = np.asarray(todates, dtype='datetime64[us]')
+        end_ordinals = todates.astype('datetime64[D]').astype(np.int64) + unix_epoch_ordinal
+        # floor division keeps timedelta.days semantics for times of day
+        start_ordinals = end_ordinals - ((todates - fromdates) // np.timedelta64(1, 'D') + 1)
+        if end_ordinals.size == 0:
+            return np.zeros(end_ordinals.shape, dtype=np.int64)
+        first_ordinal, last_ordinal, table, table_list = self._table_for(
+            int(min(start_ordinals.min(), end_ordinals.min())), int(max(start_ordinals.max(), end_ordinals.max())))
+        return table[end_ordinals - first_ordinal] - table[start_ordinals - first_ordinal]
+
+    def add_working_days_batch(self, start_date, working_days):
+        """
+        Dates on which working_days (array) working days counted from start_date inclusive are complete,
+        the inverse of working_days(start_date, date).
+        """
+        working_days = np.ceil(np.asarray(working_days, dtype=np.float64)).astype(np.int64)
+        start_ordinal = start_date.toordinal()
+        # twice the working days in calendar days leaves room for weekends and holidays
+        high_ordinal = start_ordinal + int(working_days.max(initial=0)) * 2 + 14
+        first_ordinal, last_ordinal, table, table_list = self._table_for(start_ordinal - 1, high_ordinal)
+        before_start = table[start_ordinal - 1 - first_ordinal]
+        end_ordinals = np.searchsorted(table, before_start + working_days, side='left') + first_ordinal
+        return list(map(date.fromordinal, np.maximum(end_ordinals, start_ordinal).tolist()))
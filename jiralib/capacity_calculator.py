@@ -1,22 +1,35 @@
+import asyncio
+import os
+import time
 from collections import namedtuple
-from functools import reduce
 
 import jira_connector
-from jiralib.jira_issue_wrapper import wrap_issues
-from jiralib.jira_queries import get_project_done_tasks_with_story_points
+from jiralib import profiling
+from jiralib.async_jira import AsyncJira
+from jiralib.file_cache import FileLock, read_json, write_json
+from jiralib.issue_metrics import build_task_metrics, employee_totals, project_totals, write_parquet
+from jiralib.jira_queries import get_project_done_tasks_with_story_points, \
+    get_project_done_tasks_with_story_points_async
 from jiralib.namedtuple_printer import write_csv
-from jiralib.pm_calc import Range, get_working_days_from_intervals, get_working_days
 
 min_tasks_for_stat = int(jira_connector.settings.get("capacity", "min_tasks_for_stats", fallback='10'))
+capacity_cache_folder = jira_connector.settings.get("capacity", "cache_folder", fallback='cache/capacity')
+capacity_cache_ttl = float(jira_connector.settings.get("capacity", "cache_ttl_hours", fallback='24')) * 60 * 60
+capacity_model_version = 2
+# per task metrics of the capacity model as out/<project>_metrics.parquet, needs pandas and pyarrow
+export_metrics = jira_connector.settings.getboolean("capacity", "export_metrics", fallback=False)
 
 ProjectEmployeeStatistics = namedtuple('ProjectEmployeeStatistics',
                                        'name sp_done emd_done tasks_work_days_performed calendar_work_days_performed effective_work_days_performed tasks_amount sp_work_day sp_calendar_day sp_effective_work_day md_work_day md_calendar_day md_effective_work_day')
 
 EmployeeTask = namedtuple('EmployeeTask', 'employee task sp_measure md_measure')
 
+# a stored model is only reused when it was calculated the same way
+capacity_model_key = ' '.join([str(capacity_model_version), str(min_tasks_for_stat), *ProjectEmployeeStatistics._fields])
+
 
 def collect_tasks(sp_issues, is_sp, employees_dict):
-    for issue in wrap_issues(sp_issues):
+    for issue in sp_issues:
         assignee = issue.get_open_issue_assignee_name()
         if assignee is not None:
             if assignee not in employees_dict:
@@ -25,44 +38,7 @@ def collect_tasks(sp_issues, is_sp, employees_dict):
     return employees_dict
 
 
-def calculate_calendar_work_days(employee_tasks):
-    return get_working_days(
-        reduce(lambda a,b: min(a, b),
-               map(lambda task: task.task.get_work_start_date(), employee_tasks)),
-        reduce(lambda a,b: max(a, b),
-               map(lambda task: task.task.get_work_end_date(), employee_tasks))
-    )
-
-
-def calculate_effective_work_days(employee_tasks):
-    return get_working_days_from_intervals(
-        list(
-            map(
-                lambda task: Range(task.task.get_work_start_date(), task.task.get_work_end_date()),
-                employee_tasks)
-        )
-    )
-
-
-def aggregate_stats(employee, employee_tasks, employee_count=1):
-    project_employee = ProjectEmployeeStatistics(
-        employee,
-        reduce(lambda a,b: a + b,
-               map(lambda task: task.task.get_story_points() or 0.0, employee_tasks)),
-        reduce(lambda a,b: a + b,
-               map(lambda task: task.task.get_aggregatetimeoriginalestimate() or 0.0, employee_tasks)),
-        reduce(lambda a,b: a + b,
-               map(lambda task: task.task.get_actual_working_days() or 0.0, employee_tasks)),
-        calculate_calendar_work_days(employee_tasks),
-        calculate_effective_work_days(employee_tasks),
-        len(employee_tasks),
-        0,
-        0,
-        0,
-        0,
-        0,
-        0
-    )
+def with_velocity(project_employee, employee_count=1):
     if project_employee.sp_done > 0:
         project_employee = project_employee._replace(
             sp_work_day=project_employee.tasks_work_days_performed * employee_count/project_employee.sp_done,
@@ -78,12 +54,20 @@ def aggregate_stats(employee, employee_tasks, employee_count=1):
     return project_employee
 
 
-def to_project_statistics(employees_with_tasks):
-    project_stats = list(
-        map(lambda key: aggregate_stats(key, employees_with_tasks[key]), employees_with_tasks.keys())
-    )
+def to_statistics(names, totals, employee_count=1):
+    columns = zip(totals.story_points.tolist(), totals.estimates.tolist(), totals.actual_working_days.tolist(),
+                  totals.calendar_working_days.tolist(), totals.effective_working_days.tolist(),
+                  totals.tasks_amount.tolist())
+    return list(map(lambda name_columns: with_velocity(
+        ProjectEmployeeStatistics(name_columns[0], *name_columns[1], 0, 0, 0, 0, 0, 0), employee_count),
+                    zip(names, columns)))
+
+
+def to_project_statistics(employees_with_tasks, metrics=None):
+    metrics = metrics or build_task_metrics(employees_with_tasks)
+    project_stats = to_statistics(metrics.employees, employee_totals(metrics))
     if len(project_stats) > 0:
-        project_stats.append(aggregate_stats('-',[val for sublist in employees_with_tasks.values() for val in sublist], len(project_stats)))
+        project_stats.extend(to_statistics(['-'], project_totals(metrics), len(project_stats)))
     return project_stats
 
 
@@ -95,10 +79,100 @@ def filter_not_enough_stats(employees_with_tasks):
     return filtered_employees
 
 
+def filter_without_work_dates(employees_with_tasks):
+    # a task that never left an open status or never reached a closed one has no work range to count
+    filtered_employees = {}
+    for (key, value) in employees_with_tasks.items():
+        for employee_task in value:
+            if employee_task.task.get_work_start_date() is None or employee_task.task.get_work_end_date() is None:
+                print(employee_task.task.get_key() + ' - no work start or end date, left out of the capacity model')
+            else:
+                filtered_employees.setdefault(key, []).append(employee_task)
+    return filtered_employees
+
+
 def calculate_capacity_by_project(project_name):
-    sp_issues = get_project_done_tasks_with_story_points(project_name)
-    employees_with_tasks = filter_not_enough_stats(collect_tasks(sp_issues, True, {}))
-    return to_project_statistics(employees_with_tasks)
+    return to_capacity_model(project_name, get_project_done_tasks_with_story_points(project_name))
+
+
+async def calculate_capacity_by_project_async(jira, project_name):
+    return to_capacity_model(project_name, await get_project_done_tasks_with_story_points_async(jira, project_name))
+
+
+@profiling.timed('capacity.build')
+def to_capacity_model(project_name, sp_issues):
+    employees_with_tasks = filter_not_enough_stats(filter_without_work_dates(collect_tasks(sp_issues, True, {})))
+    metrics = build_task_metrics(employees_with_tasks)
+    if export_metrics:
+        write_parquet(project_name + '_metrics.parquet', metrics)
+    return to_project_statistics(employees_with_tasks, metrics)
+
+
+def get_capacity_cache_file(project_name):
+    return os.path.join(capacity_cache_folder, project_name + '.json')
+
+
+def get_capacity_lock(project_name):
+    return FileLock(get_capacity_cache_file(project_name) + '.lock')
+
+
+def load_project_statistics(project_name, not_before=0):
+    # not_before skips a model stored before a refresh was asked for
+    model = read_json(get_capacity_cache_file(project_name))
+    if model is None or model.get('key') != capacity_model_key or time.time() - model['created'] > capacity_cache_ttl \
+            or model['created'] < not_before:
+        return None
+    return list(map(lambda statistics: ProjectEmployeeStatistics(*statistics), model['statistics']))
+
+
+def save_project_statistics(project_name, project_statistics):
+    write_json(get_capacity_cache_file(project_name), {
+        'key': capacity_model_key,
+        'created': time.time(),
+        'statistics': list(map(list, project_statistics))
+    })
+
+
+def build_project_statistics(project_name, not_before=0):
+    # concurrent runs wait for the one building the model instead of querying jira again
+    with get_capacity_lock(project_name):
+        project_statistics = load_project_statistics(project_name, not_before)
+        if project_statistics is None:
+            project_statistics = calculate_capacity_by_project(project_name)
+            save_project_statistics(project_name, project_statistics)
+        return project_statistics
+
+
+def get_project_statistics(project_name):
+    project_statistics = load_project_statistics(project_name)
+    if project_statistics is None:
+        project_statistics = build_project_statistics(project_name)
+    return project_statistics
+
+
+async def get_projects_statistics_async(project_names, jira=None):
+    if jira is None:
+        async with AsyncJira() as jira:
+            return await get_projects_statistics_async(project_names, jira)
+
+    async def get_statistics(project_name):
+        project_statistics = load_project_statistics(project_name)
+        if project_statistics is not None:
+            return project_statistics
+        # the same lock and second look as build_project_statistics, waited for outside the event loop
+        lock = get_capacity_lock(project_name)
+        await asyncio.to_thread(lock.acquire)
+        try:
+            project_statistics = load_project_statistics(project_name)
+            if project_statistics is None:
+                project_statistics = await calculate_capacity_by_project_async(jira, project_name)
+                save_project_statistics(project_name, project_statistics)
+            return project_statistics
+        finally:
+            lock.release()
+
+    # stored models are reused, the missing ones are downloaded at the same time
+    return dict(zip(project_names, await asyncio.gather(*map(get_statistics, project_names))))
 
 
 def get_issues_count(issues):
@@ -168,7 +242,18 @@ class CapacityCalculator:
         self.projects_assignee_map = {}
 
     def add_project(self, project_name):
-        project = calculate_capacity_by_project(project_name)
+        self.set_project(project_name, get_project_statistics(project_name))
+
+    def add_projects(self, project_names):
+        missing_projects = list(filter(lambda project_name: project_name not in self.projects, project_names))
+        for (project_name, project) in asyncio.run(get_projects_statistics_async(missing_projects)).items():
+            self.set_project(project_name, project)
+
+    def refresh_project(self, project_name):
+        # a model another run stored while this one waited for the lock is already fresh enough
+        self.set_project(project_name, build_project_statistics(project_name, time.time()))
+
+    def set_project(self, project_name, project):
         self.projects[project_name] = project
         self.projects_assignee_map[project_name] = to_capacity_map(project)
 
@@ -187,6 +272,7 @@ class CapacityCalculator:
         for task in tasks:
             self.calculate_remaining_work_days_for_task(task)
 
+    @profiling.timed('capacity.task_estimate')
     def calculate_remaining_work_days_for_task(self, task):
         project_name = task.get_project_key()
         # lazy init project
@@ -201,4 +287,5 @@ class CapacityCalculator:
         task.done_md_earned = task.full_md_estimate if task.is_done() else 0
         task.done_md_spent = task.get_actual_working_days_without_gaps() if task.is_done() else 0
         task.not_earned_md = task.full_md_estimate if not task.is_done() else 0
-        task.sp_velocity = estimate.sp_effective_work_day or 1
\ No newline at end of file
+        task.sp_velocity = estimate.sp_effective_work_day or 1
+        return task
\ No newline at end of file
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from jiralib.jira_issue_wrapper import JiraIssueWrapper, compact_issue_json
+
+
+class ChangelogLoader:
+    """
+    Wraps issues searched without their changelog. The first wrapper that reads its timeline makes the loader fetch
+    the changelogs of every issue still waiting: chunked 'key in (...)' searches, at most workers at a time.
+
+        loader = ChangelogLoader(fetch_changelogs, compact=True)
+        issues = loader.wrap_all(fetch_issues(jql, fields, expand=None))
+
+    fetch_changelogs gets a chunk of keys and returns the issues found with their changelog.
+    """
+
+    def __init__(self, fetch_changelogs, compact=False, workers=4, chunk_size=100):
+        self.fetch_changelogs = fetch_changelogs
+        self.compact = compact
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.pending = {}
+        # keys whose changelogs another thread is fetching, set once they are loaded
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def wrap(self, issue_json):
+        wrapped_issue = JiraIssueWrapper(compact_issue_json(issue_json) if self.compact else issue_json)
+        wrapped_issue._changelog_loader = self
+        with self.lock:
+            self.pending[wrapped_issue.get_key()] = wrapped_issue
+        return wrapped_issue
+
+    def wrap_all(self, issues_json):
+        # a chunk is wrapped before any of it is handed out, so a consumer reading every timeline right away
+        # still loads the changelogs chunk by chunk instead of one issue at a time
+        issues_json = iter(issues_json)
+        chunk = list(islice(issues_json, self.chunk_size))
+        while chunk:
+            yield from list(map(self.wrap, chunk))
+            chunk = list(islice(issues_json, self.chunk_size))
+
+    def load(self, key=None):
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            loaded = threading.Event()
+            for pending_key in pending:
+                self.loading[pending_key] = loaded
+            other_load = self.loading.get(key) if key not in pending else None
+        if other_load is not None:
+            other_load.wait()
+        if not pending:
+            return
+        keys = list(pending)
+        try:
+            self.fetch(pending)
+            for wrapped_issue in pending.values():
+                wrapped_issue.set_changelog({'histories': []}, not self.compact)
+        except BaseException:
+            # the issues not loaded wait for the next timeline read
+            with self.lock:
+                self.pending.update(pending)
+            raise
+        finally:
+            with self.lock:
+                for loaded_key in keys:
+                    self.loading.pop(loaded_key, None)
+            loaded.set()
+
+    def fetch(self, pending):
+        # fetched outside of the lock, wrappers of other chunks keep loading meanwhile
+        keys = list(pending)
+        chunks = [keys[first:first + self.chunk_size] for first in range(0, len(keys), self.chunk_size)]
+        if self.workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                chunks_issues = list(executor.map(self.fetch_changelogs, chunks))
+        else:
+            chunks_issues = list(map(self.fetch_changelogs, chunks))
+        for issues_json in chunks_issues:
+            for issue_json in issues_json:
+                wrapped_issue = pending.pop(issue_json['key'], None)
+                if wrapped_issue is not None:
+                    wrapped_issue.set_changelog(issue_json['changelog'], not self.compact)
+        # keys left in pending were not found, deleted or hidden issues
@@ -0,0 +1,76 @@
+from collections import namedtuple
+
+from jiralib import profiling
+from jiralib.jira_issue_wrapper import JiraIssueWrapper
+
+# what an output column needs, every stage includes the previous ones
+stages = ('fields', 'timeline', 'capacity')
+
+Column = namedtuple('Column', 'name fields stage')
+ColumnPlan = namedtuple('ColumnPlan', 'getters fields expand stage')
+
+assignee_fields = ('assignee', 'customfield_12000')
+# the timeline is built for the assignee, done and open are told by the status
+timeline_fields = ('status', *assignee_fields)
+capacity_fields = (*timeline_fields, 'project', 'customfield_10002', 'aggregatetimeoriginalestimate')
+timeline_expand = 'changelog'
+
+columns = {}
+
+
+def register_column(name, fields=(), stage='fields'):
+    columns[name] = Column(name, tuple(fields), stage)
+
+
+for (name, fields) in [('key', ()), ('id', ()), ('priority', ('priority',)), ('assignee', ('assignee',)),
+                       ('assignee_name', assignee_fields), ('dev_assignee', ('customfield_12000',)),
+                       ('qa_assignee', ('customfield_11000',)), ('status', ('status',)),
+                       ('status_html', ('status',)), ('status_category', ('status',)), ('status_color', ('status',)),
+                       ('duedate', ('duedate',)), ('story_points', ('customfield_10002',)),
+                       ('subtasks', ('subtasks',)), ('issue_links', ('issuelinks',)),
+                       ('related_keys', ('issuelinks',)), ('depend_from_keys', ('issuelinks',)),
+                       ('depend_to_keys', ('issuelinks',)), ('part_of_keys', ('issuelinks',)),
+                       ('encorporates_keys', ('issuelinks',)), ('issue_type', ('issuetype',)),
+                       ('project', ('project',)), ('project_key', ('project',)), ('project_name', ('project',)),
+                       ('resolutiondate', ('resolutiondate',)), ('description', ('description',)),
+                       ('summary', ('summary',)), ('aggregatetimeestimate', ('aggregatetimeestimate',)),
+                       ('aggregatetimeoriginalestimate', ('aggregatetimeoriginalestimate',)),
+                       ('progress', ('progress',))]:
+    register_column(name, fields)
+
+for name in ['work_start_date', 'work_end_date', 'actual_working_days', 'actual_working_days_with_gaps',
+             'actual_working_days_without_gaps', 'dev_actual_working_days_with_gaps',
+             'qa_actual_working_days_with_gaps', 'open_issue_assignee_name']:
+    register_column(name, timeline_fields, 'timeline')
+
+for name in ['remaining_md', 'full_md_estimate', 'done_md_earned', 'done_md_spent', 'not_earned_md', 'sp_velocity']:
+    register_column(name, capacity_fields, 'capacity')
+
+
+def get_column(name):
+    if not hasattr(JiraIssueWrapper, 'get_' + name):
+        raise ValueError('Unknown column ' + name)
+    # a getter nobody registered may read anything, it gets all fields and every stage
+    return columns.get(name) or Column(name, None, stages[-1])
+
+
+def compile_header(header):
+    header_columns = list(map(get_column, header._fields))
+    stage = stages[max(map(lambda column: stages.index(column.stage), header_columns), default=0)]
+    fields = None
+    if all(map(lambda column: column.fields is not None, header_columns)):
+        # fetch_keys asks for 'key' the same way, an empty list would bring every field
+        fields = sorted(set(field for column in header_columns for field in column.fields)) or ['key']
+    return ColumnPlan(tuple(map(lambda column: getattr(JiraIssueWrapper, 'get_' + column.name), header_columns)),
+                      fields,
+                      timeline_expand if needs_stage(stage, 'timeline') else None,
+                      stage)
+
+
+def needs_stage(stage, required_stage):
+    return stages.index(stage) >= stages.index(required_stage)
+
+
+@profiling.timed('export.row')
+def to_row(plan, issue):
+    return tuple(getter(issue) for getter in plan.getters)
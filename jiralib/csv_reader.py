@@ -2,12 +2,12 @@ import csv
 from collections import namedtuple
 
 
-def read_csv(filename):
+def iter_csv(filename):
     with open(filename, newline="") as infile:
         reader = csv.reader(infile)
         Data = namedtuple("Data", next(reader))  # get names from column headers
-        result = []
-        for data in map(Data._make, reader):
-            result.append(data)
-        return result
+        yield from map(Data._make, reader)
+
 
+def read_csv(filename):
+    return list(iter_csv(filename))
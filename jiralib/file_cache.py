@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import time
+
+
+def read_json(filename):
+    try:
+        with open(filename, encoding='utf-8') as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(filename, content):
+    # readers in other processes see either the old or the new file, never a half written one
+    folder = os.path.dirname(filename) or '.'
+    os.makedirs(folder, exist_ok=True)
+    file_descriptor, temp_filename = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'w', encoding='utf-8') as json_file:
+            json.dump(content, json_file)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        os.remove(temp_filename)
+        raise
+
+
+class FileLock:
+    """
+    Lock shared between processes: a lock file created exclusively. A lock older than stale_seconds
+    is considered left by a crashed process and taken over.
+    """
+
+    def __init__(self, filename, stale_seconds=1800, poll_seconds=0.5):
+        self.filename = filename
+        self.stale_seconds = stale_seconds
+        self.poll_seconds = poll_seconds
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        while True:
+            try:
+                os.close(os.open(self.filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return
+            except FileExistsError:
+                self._remove_stale_lock()
+                time.sleep(self.poll_seconds)
+
+    def release(self):
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _remove_stale_lock(self):
+        try:
+            if time.time() - os.path.getmtime(self.filename) > self.stale_seconds:
+                os.remove(self.filename)
+        except FileNotFoundError:
+            pass
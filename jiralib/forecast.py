@@ -0,0 +1,122 @@
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+import jira_connector
+from jiralib import pm_calc, profiling
+from jiralib.capacity_calculator import CapacityCalculator, collect_tasks, filter_not_enough_stats
+from jiralib.issue_metrics import build_task_metrics, group_sum
+from jiralib.jira_queries import get_project_done_tasks_with_story_points, search_wrapped_issues
+
+scenarios = int(jira_connector.settings.get("forecast", "scenarios", fallback='100000'))
+seed = int(jira_connector.settings.get("forecast", "seed", fallback='1'))
+# scenario x task cells sampled at once, bounds the memory of long epics
+chunk_cells = 2 ** 21
+unassigned_lane = 'unassigned'
+
+Forecast = namedtuple('Forecast',
+                      'key tasks remaining_md p50_days p85_days p95_days p50_date p85_date p95_date')
+
+
+def velocity_samples(done_tasks):
+    """
+    Days per story point of the done tasks of every assignee divided by the assignee mean: the spread of the velocity,
+    the capacity model already gives the mean. '-' pools the tasks of every assignee.
+    """
+    metrics = build_task_metrics(filter_not_enough_stats(collect_tasks(done_tasks, True, {})))
+    with_points = metrics.story_points > 0
+    codes = metrics.employee_codes[with_points]
+    days_per_point = metrics.actual_working_days[with_points] / metrics.story_points[with_points]
+    groups = len(metrics.employees)
+    means = group_sum(codes, days_per_point, groups) / np.maximum(group_sum(codes, np.ones(codes.size), groups), 1)
+    ratios = days_per_point / np.where(means > 0, means, 1)[codes]
+    samples = {employee: ratios[codes == code] for (code, employee) in enumerate(metrics.employees)}
+    samples['-'] = ratios
+    return {employee: employee_samples for (employee, employee_samples) in samples.items() if employee_samples.size > 0}
+
+
+def task_days(remaining_days, sample_offsets, sample_counts, samples, scenario_count, generator):
+    # a task with samples takes its remaining days times a drawn ratio, the others follow pm_calc's triangle
+    picks = sample_offsets + (generator.random((scenario_count, remaining_days.size)) * sample_counts).astype(np.int64)
+    days = remaining_days * samples[picks]
+    triangle = np.flatnonzero((sample_counts == 0) & (remaining_days > 0))
+    if triangle.size > 0:
+        base = remaining_days[triangle]
+        days[:, triangle] = generator.triangular(np.maximum(list(map(pm_calc.square_min, base)), 0), base,
+                                                 list(map(pm_calc.square_max, base)),
+                                                 (scenario_count, triangle.size))
+    return days
+
+
+@profiling.timed('forecast.simulate')
+def simulate(remaining_days, lane_codes, sample_offsets, sample_counts, samples, scenario_count=scenarios,
+             generator=None):
+    """
+    Completion working days of every scenario: the tasks of a lane are done one after another, lanes in parallel.
+    A task draws from samples[offset:offset + count], count 0 uses square_min..square_max around its remaining days.
+    """
+    generator = generator or np.random.default_rng(seed)
+    lanes = int(lane_codes.max(initial=-1)) + 1
+    lane_days = np.zeros((scenario_count, lanes))
+    chunk = max(1, chunk_cells // scenario_count)
+    for first in range(0, remaining_days.size, chunk):
+        tasks = slice(first, first + chunk)
+        lane_matrix = (lane_codes[tasks, None] == np.arange(lanes)).astype(np.float64)
+        lane_days += task_days(remaining_days[tasks], sample_offsets[tasks], sample_counts[tasks], samples,
+                               scenario_count, generator) @ lane_matrix
+    return lane_days.max(axis=1, initial=0.0)
+
+
+class DeliveryForecaster:
+    """
+    Monte Carlo completion forecast of a set of open tasks: remaining days come from the capacity model, every assignee
+    works through their tasks with the velocity spread seen on their done tasks.
+    """
+
+    def __init__(self, capacity_calculator=None, scenario_count=scenarios):
+        self.capacity_calculator = capacity_calculator or CapacityCalculator()
+        self.scenario_count = scenario_count
+        self.projects_samples = {}
+
+    def get_velocity_samples(self, project_name):
+        if project_name not in self.projects_samples:
+            self.projects_samples[project_name] = velocity_samples(
+                get_project_done_tasks_with_story_points(project_name))
+        return self.projects_samples[project_name]
+
+    def forecast(self, key, tasks, start_date=None):
+        tasks = [task for task in tasks if not task.is_done()]
+        lanes = {}
+        groups = {}
+        sample_arrays = [np.ones(1)]
+        lane_codes = []
+        sample_offsets = []
+        sample_counts = []
+        for task in tasks:
+            self.capacity_calculator.calculate_remaining_work_days_for_task(task)
+            assignee = task.get_open_issue_assignee_name()
+            lane_codes.append(lanes.setdefault(assignee or unassigned_lane, len(lanes)))
+            project_samples = self.get_velocity_samples(task.get_project_key())
+            group = (task.get_project_key(), assignee if assignee in project_samples else '-')
+            if group not in groups and group[1] in project_samples:
+                groups[group] = (sum(map(len, sample_arrays)), len(project_samples[group[1]]))
+                sample_arrays.append(project_samples[group[1]])
+            (offset, count) = groups.get(group, (0, 0))
+            sample_offsets.append(offset)
+            sample_counts.append(count)
+        remaining_days = np.array(list(map(lambda task: task.remaining_md, tasks)), dtype=np.float64)
+        completion_days = simulate(remaining_days, np.array(lane_codes, dtype=np.int64),
+                                   np.array(sample_offsets, dtype=np.int64), np.array(sample_counts, dtype=np.int64),
+                                   np.concatenate(sample_arrays), self.scenario_count, np.random.default_rng(seed))
+        days = np.percentile(completion_days, [50, 85, 95])
+        return Forecast(key, len(tasks), float(remaining_days.sum()), *days.tolist(),
+                        *pm_calc.add_working_days_batch(start_date or date.today(), days))
+
+    def forecast_epic(self, epic_key, start_date=None):
+        return self.forecast(epic_key, search_wrapped_issues('"Epic Link" = ' + epic_key + ' AND statusCategory != done'),
+                             start_date)
+
+    def forecast_open_epics(self, project_name, start_date=None):
+        epics = search_wrapped_issues('project = ' + project_name + ' AND issuetype = Epic AND statusCategory != done')
+        return map(lambda epic: self.forecast_epic(epic.get_key(), start_date), epics)
@@ -0,0 +1,434 @@
+import atexit
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+from jira.exceptions import JIRAError
+from requests.structures import CaseInsensitiveDict
+
+from jiralib import profiling
+from jiralib.file_cache import read_json, write_json
+
+recorded_headers = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+
+# metadata endpoints worth caching and minutes a stored answer is used without asking jira again
+CacheRule = namedtuple('CacheRule', 'name path_pattern ttl_minutes')
+
+default_cache_rules = [
+    CacheRule('boards', r'/rest/agile/1\.0/board/?$', 1440),
+    CacheRule('board', r'/rest/agile/1\.0/board/\d+/?$', 1440),
+    CacheRule('sprints', r'/rest/agile/1\.0/board/\d+/sprint/?$', 10),
+    CacheRule('fields', r'/rest/api/2/field/?$', 1440),
+    CacheRule('issue_types', r'/rest/api/2/issuetype/?$', 1440),
+    CacheRule('projects', r'/rest/api/2/project(/[^/]+)?/?$', 1440),
+    CacheRule('server_info', r'/rest/api/2/serverInfo/?$', 60),
+]
+
+HttpCacheStats = namedtuple('HttpCacheStats', 'hits revalidated misses')
+SchedulerStats = namedtuple('SchedulerStats', 'requests retries overloaded concurrency')
+
+# jira is busy, the request was not processed and may be sent again
+throttle_statuses = (429, 503)
+# the answer may have been lost after processing, only safe to repeat for reads
+gateway_statuses = (502, 504)
+
+
+class ReplayMissError(LookupError):
+    pass
+
+
+class SessionWrapper:
+    """
+    Stands in for the requests session of the jira client. Every verb goes through request(), everything else
+    (headers, auth, cookies...) is delegated to the wrapped session, so wrappers can be stacked.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def __setattr__(self, name, value):
+        # the jira client configures its session (max_retries, proxies, verify...) after it is wrapped,
+        # settings the requests session knows go to it, the wrappers keep their own attributes
+        if 'session' in self.__dict__ and name not in self.__dict__ and hasattr(self.root_session(), name):
+            setattr(self.root_session(), name, value)
+        else:
+            super().__setattr__(name, value)
+
+    def root_session(self):
+        session = self.session
+        while isinstance(session, SessionWrapper):
+            session = session.session
+        return session
+
+    def request(self, method, url, **kwargs):
+        return getattr(self.session, method.lower())(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+
+def normalize_body(body):
+    if body is None:
+        return ''
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    if not isinstance(body, str):
+        return json.dumps(body, sort_keys=True)
+    try:
+        return json.dumps(json.loads(body), sort_keys=True)
+    except ValueError:
+        return body
+
+
+def request_key(method, url, base_url, params=None, data=None, json_body=None):
+    path = url[len(base_url):] if url.startswith(base_url) else url
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    body = normalize_body(data if data is not None else json_body)
+    return hashlib.sha1('\n'.join([method.upper(), path, query, body]).encode('utf-8')).hexdigest()
+
+
+def key_for(method, url, base_url, kwargs):
+    return request_key(method, url, base_url, kwargs.get('params'), kwargs.get('data'), kwargs.get('json'))
+
+
+def to_entry(method, response):
+    return {
+        'method': method.upper(),
+        'url': response.url,
+        'status_code': response.status_code,
+        'reason': response.reason,
+        'headers': {name: response.headers[name] for name in recorded_headers if name in response.headers},
+        'body': response.text,
+    }
+
+
+def to_response(entry):
+    response = requests.Response()
+    response.status_code = entry['status_code']
+    response.reason = entry['reason']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.url = entry['url']
+    response.encoding = 'utf-8'
+    response._content = entry['body'].encode('utf-8')
+    return response
+
+
+class RecordingSession(SessionWrapper):
+    """
+    Sends requests to jira and appends every response to a zip fixture archive, one json entry per distinct request.
+    """
+
+    def __init__(self, session, archive_file, base_url):
+        super().__init__(session)
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        folder = os.path.dirname(archive_file)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self.archive = zipfile.ZipFile(archive_file, mode='a', compression=zipfile.ZIP_DEFLATED)
+        self.recorded = set(self.archive.namelist())
+        atexit.register(self.close)
+
+    def request(self, method, url, **kwargs):
+        response = super().request(method, url, **kwargs)
+        name = key_for(method, url, self.base_url, kwargs) + '.json'
+        with self.lock:
+            if name not in self.recorded:
+                self.archive.writestr(name, json.dumps(to_entry(method, response)))
+                self.recorded.add(name)
+        return response
+
+    def close(self):
+        with self.lock:
+            self.archive.close()
+
+
+class ReplaySession(SessionWrapper):
+    """
+    Answers requests from a fixture archive written by RecordingSession, nothing is sent over the network.
+    """
+
+    def __init__(self, session, archive_file, base_url):
+        super().__init__(session)
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        self.archive = zipfile.ZipFile(archive_file, mode='r')
+        self.recorded = set(self.archive.namelist())
+
+    def request(self, method, url, **kwargs):
+        name = key_for(method, url, self.base_url, kwargs) + '.json'
+        if name not in self.recorded:
+            raise ReplayMissError('No recorded response for ' + method.upper() + ' ' + url + ' ' + str(kwargs.get('params') or ''))
+        with self.lock:
+            entry = json.loads(self.archive.read(name).decode('utf-8'))
+        return to_response(entry)
+
+
+class CachingSession(SessionWrapper):
+    """
+    Keeps GET answers of slowly changing endpoints on disk. A stored answer younger than the ttl of its rule is
+    returned as is, an older one is revalidated with If-None-Match/If-Modified-Since when jira sent an ETag or
+    Last-Modified, and downloaded again otherwise. Requests no rule matches go straight to jira.
+    """
+
+    def __init__(self, session, cache_folder, base_url, cache_rules=default_cache_rules):
+        super().__init__(session)
+        self.cache_folder = cache_folder
+        self.base_url = base_url
+        self.cache_rules = list(map(lambda rule: (re.compile(rule.path_pattern), rule.ttl_minutes * 60), cache_rules))
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def get_ttl(self, url):
+        path = url[len(self.base_url):] if url.startswith(self.base_url) else url
+        for (path_pattern, ttl) in self.cache_rules:
+            if path_pattern.match(path):
+                return ttl
+        return None
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self.lock:
+            return HttpCacheStats(self.counts['hits'], self.counts['revalidated'], self.counts['misses'])
+
+    def request(self, method, url, **kwargs):
+        ttl = self.get_ttl(url) if method.upper() == 'GET' else None
+        if ttl is None:
+            return super().request(method, url, **kwargs)
+        cache_file = os.path.join(self.cache_folder, key_for(method, url, self.base_url, kwargs) + '.json')
+        entry = read_json(cache_file)
+        if entry is not None and time.time() - entry['stored'] < ttl:
+            self.count('hits')
+            return to_response(entry)
+        try:
+            response = super().request(method, url, **{**kwargs, 'headers': conditional_headers(kwargs.get('headers'), entry)})
+        except JIRAError as error:
+            # the jira session raises on anything but a success, not modified included
+            if error.status_code != 304 or entry is None:
+                raise
+            response = error.response
+        if response.status_code == 304 and entry is not None:
+            self.count('revalidated')
+            write_json(cache_file, {**entry, 'stored': time.time()})
+            return to_response(entry)
+        self.count('misses')
+        if response.status_code == 200:
+            write_json(cache_file, {**to_entry(method, response), 'stored': time.time()})
+        return response
+
+
+def conditional_headers(headers, entry):
+    headers = dict(headers or {})
+    if entry is not None:
+        stored_headers = CaseInsensitiveDict(entry['headers'])
+        if 'ETag' in stored_headers:
+            headers['If-None-Match'] = stored_headers['ETag']
+        if 'Last-Modified' in stored_headers:
+            headers['If-Modified-Since'] = stored_headers['Last-Modified']
+    return headers
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit adjusted with AIMD: every answer in time adds 1/limit, so the limit grows by about one per
+    round trip, an overloaded answer (429, 503...) halves it, once per round trip. Latency is compared per endpoint
+    with the fastest average seen for it, a search page is always slower than a board list: answers slow_factor
+    times slower than that stop the growth without cutting the limit.
+    A Retry-After pauses every request, the server asked all of them to wait.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, slow_factor=3.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_factor = slow_factor
+        self.latencies = {}
+        self.baselines = {}
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                else:
+                    self.condition.wait()
+
+    def release(self, latency=None, overloaded=False, endpoint=None):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                # answers of the same round trip report the same congestion, the limit is cut once for them
+                if now - self.last_decrease > (latency or 0):
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self.last_decrease = now
+            elif latency is not None and not self.is_slow(endpoint, latency):
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def is_slow(self, endpoint, latency):
+        average = self.latencies.get(endpoint)
+        average = latency if average is None else average * 0.8 + latency * 0.2
+        self.latencies[endpoint] = average
+        self.baselines[endpoint] = min(self.baselines.get(endpoint, average), average)
+        return average > self.baselines[endpoint] * self.slow_factor
+
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def get_retry_after(response):
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_overloaded(method, response, error):
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return method.upper() == 'GET'
+    if response is None:
+        return False
+    return response.status_code in throttle_statuses or \
+        (response.status_code in gateway_statuses and method.upper() == 'GET')
+
+
+class ThrottledSession(SessionWrapper):
+    """
+    Sends requests within an AdaptiveLimit and repeats the ones jira rejected as overloaded (429, 503, and 502, 504
+    or connection errors of reads), after Retry-After when jira sent one, or else after a jittered exponential backoff.
+    The jira session must not retry on its own, max_retries=0.
+    """
+
+    def __init__(self, session, limit, max_retries=6, backoff_seconds=0.5, max_backoff_seconds=60.0):
+        super().__init__(session)
+        self.limit = limit
+        # not max_retries, the jira client sets that one on its session after creating it
+        self.retry_limit = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'retries': 0, 'overloaded': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self.lock:
+            return SchedulerStats(self.counts['requests'], self.counts['retries'], self.counts['overloaded'],
+                                  int(self.limit.limit))
+
+    def backoff(self, attempt):
+        # full jitter, concurrent retries spread instead of coming back together
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        self.count('requests')
+        attempt = 0
+        while True:
+            (response, error, overloaded) = self.send(method, url, **kwargs)
+            if overloaded:
+                self.count('overloaded')
+            if not overloaded or attempt >= self.retry_limit:
+                if error is not None:
+                    raise error
+                return response
+            self.count('retries')
+            retry_after = get_retry_after(response)
+            if retry_after is not None:
+                self.limit.pause(retry_after)
+            else:
+                time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def send(self, method, url, **kwargs):
+        self.limit.acquire()
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, **kwargs)
+            error = None
+        except JIRAError as jira_error:
+            (response, error) = (jira_error.response, jira_error)
+        except (requests.ConnectionError, requests.Timeout) as connection_error:
+            (response, error) = (None, connection_error)
+        except BaseException:
+            self.limit.release()
+            raise
+        overloaded = is_overloaded(method, response, error)
+        self.limit.release(time.monotonic() - started, overloaded, endpoint_name(method, url, ''))
+        return (response, error, overloaded)
+
+
+def endpoint_name(method, url, base_url):
+    path = url[len(base_url):] if url.startswith(base_url) else url
+    path = re.sub(r'/[A-Z][A-Z0-9_]*-\d+(?=/|$)', '/{key}', path.split('?')[0])
+    # ids become {id}, the rest api version stays
+    return 'http ' + method.upper() + ' ' + re.sub(r'(?<!/api)/\d+(?=/|$)', '/{id}', path)
+
+
+class ProfilingSession(SessionWrapper):
+    """
+    Adds the latency and the answer size of every request to the profile, per endpoint.
+    """
+
+    def __init__(self, session, base_url):
+        super().__init__(session)
+        self.base_url = base_url
+
+    def request(self, method, url, **kwargs):
+        started = time.perf_counter()
+        response = None
+        try:
+            response = super().request(method, url, **kwargs)
+            return response
+        finally:
+            profiling.add(endpoint_name(method, url, self.base_url), time.perf_counter() - started,
+                          len(response.content) if response is not None else 0)
@@ -0,0 +1,211 @@
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import jira_connector
+from jiralib.capacity_calculator import CapacityCalculator
+from jiralib.jira_issue_wrapper import compact_fields, wrap_compact_issue, wrap_issue
+from jiralib.jira_queries import compact_search, fetch_issues, issue_expand, page_size, page_workers
+
+# keys per 'key in (...)' search, one page each
+chunk_size = min(int(jira_connector.settings.get("graph", "chunk_size", fallback='100')), page_size)
+epic_link_field = jira_connector.settings.get("graph", "epic_link_field", fallback='customfield_10006')
+
+CriticalPath = namedtuple('CriticalPath', 'keys remaining_md')
+EpicRollup = namedtuple('EpicRollup', 'key summary issues remaining_md critical_path_md critical_path')
+
+
+def to_chunks(keys, size=chunk_size):
+    keys = sorted(keys)
+    return [keys[first:first + size] for first in range(0, len(keys), size)]
+
+
+def to_components(keys, next_keys):
+    # strongly connected components by an iterative tarjan, each key maps to the root key of its component
+    index = {}
+    low = {}
+    component = {}
+    stack = []
+    for root_key in keys:
+        if root_key in index:
+            continue
+        index[root_key] = low[root_key] = len(index)
+        stack.append(root_key)
+        visits = [(root_key, iter(next_keys(root_key)))]
+        while visits:
+            (key, edges) = visits[-1]
+            next_key = next(edges, None)
+            if next_key is not None:
+                if next_key not in index:
+                    index[next_key] = low[next_key] = len(index)
+                    stack.append(next_key)
+                    visits.append((next_key, iter(next_keys(next_key))))
+                elif next_key not in component:
+                    low[key] = min(low[key], index[next_key])
+                continue
+            visits.pop()
+            if visits:
+                low[visits[-1][0]] = min(low[visits[-1][0]], low[key])
+            if low[key] == index[key]:
+                member_key = None
+                while member_key != key:
+                    member_key = stack.pop()
+                    component[member_key] = key
+    return component
+
+
+def search_chunk(jql_field, keys):
+    # graph searches are one-off queries and skip the store, unknown keys are dropped instead of failing the search
+    jql = jql_field + ' in (' + ', '.join(keys) + ')'
+    if compact_search:
+        return list(map(lambda issue: (issue['fields'].get(epic_link_field), wrap_compact_issue(issue)),
+                        fetch_issues(jql, [*compact_fields, epic_link_field], 'changelog', validate_query=False)))
+    return list(map(lambda issue: (issue['fields'].get(epic_link_field), wrap_issue(issue)),
+                    fetch_issues(jql, None, issue_expand, validate_query=False)))
+
+
+class IssueGraph:
+    """
+    Issues reachable through dependency, part of / encorporates, subtask and epic links, loaded level by level with
+    one 'key in (...)' search per chunk of unknown keys. Dependencies run from the issue that has to be done first,
+    a parent waits for its children.
+    """
+
+    def __init__(self, capacity_calculator=None):
+        self.capacity_calculator = capacity_calculator or CapacityCalculator()
+        self.issues = {}
+        self.missing = set()
+        self.searched_epics = set()
+        self.estimated = set()
+        self.successors = {}
+        self.predecessors = {}
+        self.children = {}
+        self.parents = {}
+        self.requests = 0
+
+    def add_edge(self, index, reverse_index, from_key, to_key):
+        index.setdefault(from_key, set()).add(to_key)
+        reverse_index.setdefault(to_key, set()).add(from_key)
+
+    def add_issue(self, issue, epic_key=None):
+        key = issue.get_key()
+        self.issues[key] = issue
+        for depend_from_key in issue.get_depend_from_keys():
+            self.add_edge(self.successors, self.predecessors, depend_from_key, key)
+        for depend_to_key in issue.get_depend_to_keys():
+            self.add_edge(self.successors, self.predecessors, key, depend_to_key)
+        for parent_key in issue.get_part_of_keys() + ([epic_key] if epic_key else []):
+            self.add_edge(self.children, self.parents, parent_key, key)
+        for child_key in issue.get_encorporates_keys() + list(map(lambda subtask: subtask['key'], issue.get_subtasks())):
+            self.add_edge(self.children, self.parents, key, child_key)
+
+    def linked_keys(self, key):
+        return (self.successors.get(key, set()) | self.predecessors.get(key, set()) |
+                self.children.get(key, set()) | self.parents.get(key, set()))
+
+    def search_chunks(self, jql_field, keys):
+        chunks = to_chunks(keys)
+        self.requests += len(chunks)
+        with ThreadPoolExecutor(max_workers=page_workers) as executor:
+            return [found for chunk in executor.map(lambda chunk: search_chunk(jql_field, chunk), chunks)
+                    for found in chunk]
+
+    def load(self, keys, max_depth=None):
+        """
+        Loads keys and everything linked to them, max_depth link levels away when given.
+        """
+        frontier = set(keys) - self.issues.keys() - self.missing
+        depth = 0
+        while frontier and (max_depth is None or depth <= max_depth):
+            found = self.search_chunks('key', frontier)
+            epics = set(issue.get_key() for (epic_key, issue) in found if issue.is_epic()) - self.searched_epics
+            if epics:
+                self.searched_epics |= epics
+                found.extend(self.search_chunks('"Epic Link"', epics))
+            for (epic_key, issue) in found:
+                if issue.get_key() not in self.issues:
+                    self.add_issue(issue, epic_key)
+            self.missing |= frontier - self.issues.keys()
+            frontier = set(linked_key for (epic_key, issue) in found for linked_key in self.linked_keys(issue.get_key())
+                           if linked_key not in self.issues and linked_key not in self.missing)
+            depth += 1
+        return self
+
+    def get_remaining_md(self, key):
+        issue = self.issues.get(key)
+        # epics and unloaded issues carry no work of their own
+        if issue is None or issue.is_epic():
+            return 0
+        if key not in self.estimated:
+            self.capacity_calculator.calculate_remaining_work_days_for_task(issue)
+            self.estimated.add(key)
+        return issue.remaining_md
+
+    def get_descendants(self, key):
+        descendants = set()
+        pending = [key]
+        while pending:
+            for child_key in self.children.get(pending.pop(), ()):
+                if child_key not in descendants and child_key != key:
+                    descendants.add(child_key)
+                    pending.append(child_key)
+        return descendants
+
+    def rollup_remaining_md(self, key):
+        # an issue reached through several parents is counted once
+        return self.get_remaining_md(key) + sum(map(self.get_remaining_md, self.get_descendants(key)))
+
+    def waits_for(self, key):
+        return self.predecessors.get(key, set()) | self.children.get(key, set())
+
+    def finish_days(self):
+        """
+        Remaining days until each issue is done when everything it waits for is done first, and the key it waits for
+        the longest. A cycle is broken at its smallest key left waiting only for issues of the cycle, so issues
+        downstream of the cycle still wait for it.
+        """
+        keys = self.issues.keys() | set(self.successors) | set(self.predecessors) | set(self.children) | set(self.parents)
+        blocking = {key: len(self.waits_for(key)) for key in keys}
+        ready = deque(key for (key, count) in blocking.items() if count == 0)
+        finish_days = {}
+        longest_waits = {}
+        components = None
+        while len(finish_days) < len(keys):
+            if not ready:
+                # a cycle: start from an issue of it with what is known so far, not from one downstream of it
+                components = components or to_components(keys, self.waits_for)
+                ready.append(min(key for key in keys if key not in finish_days and all(
+                    components[wait_key] == components[key] for wait_key in self.waits_for(key)
+                    if wait_key not in finish_days)))
+            key = ready.popleft()
+            if key in finish_days:
+                continue
+            waits = [wait_key for wait_key in self.waits_for(key) if wait_key in finish_days]
+            longest_waits[key] = max(waits, key=lambda wait_key: finish_days[wait_key], default=None)
+            finish_days[key] = self.get_remaining_md(key) + (finish_days[longest_waits[key]] if waits else 0)
+            for next_key in self.successors.get(key, set()) | self.parents.get(key, set()):
+                blocking[next_key] -= 1
+                if blocking[next_key] == 0:
+                    ready.append(next_key)
+        return (finish_days, longest_waits)
+
+    def critical_path(self, keys=None, finish=None):
+        """
+        The chain of issues with the most remaining days that ends in one of keys, every loaded issue by default.
+        """
+        (finish_days, longest_waits) = finish or self.finish_days()
+        end_key = max(self.issues if keys is None else keys, key=lambda key: finish_days.get(key, 0), default=None)
+        path = []
+        while end_key is not None and end_key not in path:
+            path.append(end_key)
+            end_key = longest_waits.get(end_key)
+        return CriticalPath(path[::-1], finish_days.get(path[0], 0) if path else 0)
+
+    def epic_rollups(self):
+        finish = self.finish_days()
+        epics = sorted(key for (key, issue) in self.issues.items() if issue.is_epic())
+        return list(map(lambda key: self.to_epic_rollup(key, finish), epics))
+
+    def to_epic_rollup(self, key, finish):
+        path = self.critical_path([key], finish)
+        return EpicRollup(key, self.issues[key].get_summary(), len(self.get_descendants(key)),
+                          self.rollup_remaining_md(key), path.remaining_md, ' '.join(path.keys))
@@ -0,0 +1,124 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from jiralib.pm_calc import get_working_days_batch
+
+# one entry per task, the employee is an index into employees
+TaskMetrics = namedtuple('TaskMetrics',
+                         'employees employee_codes keys story_points estimates actual_working_days work_start_dates work_end_dates')
+
+GroupTotals = namedtuple('GroupTotals',
+                         'story_points estimates actual_working_days calendar_working_days effective_working_days tasks_amount')
+
+
+def to_number_array(values):
+    # a missing value counts as 0.0, a column of ints only stays int
+    return np.array(list(map(lambda value: value or 0.0, values)))
+
+
+def build_task_metrics(employees_with_tasks):
+    employees = list(employees_with_tasks.keys())
+    employee_codes = []
+    keys = []
+    story_points = []
+    estimates = []
+    actual_working_days = []
+    work_start_dates = []
+    work_end_dates = []
+    # the only pass over the wrappers, everything else works on the columns
+    for (employee_code, employee) in enumerate(employees):
+        for employee_task in employees_with_tasks[employee]:
+            task = employee_task.task
+            employee_codes.append(employee_code)
+            keys.append(task.get_key())
+            story_points.append(task.get_story_points())
+            estimates.append(task.get_aggregatetimeoriginalestimate())
+            actual_working_days.append(task.get_actual_working_days())
+            work_start_dates.append(task.get_work_start_date())
+            work_end_dates.append(task.get_work_end_date())
+    return TaskMetrics(employees,
+                       np.array(employee_codes, dtype=np.int64),
+                       keys,
+                       to_number_array(story_points),
+                       to_number_array(estimates),
+                       to_number_array(actual_working_days),
+                       np.array(work_start_dates, dtype='datetime64[us]'),
+                       np.array(work_end_dates, dtype='datetime64[us]'))
+
+
+def group_sum(codes, values, groups):
+    # np.add.at adds in task order, the sums are the same as the sequential ones
+    totals = np.zeros(groups, dtype=values.dtype)
+    np.add.at(totals, codes, values)
+    return totals
+
+
+def merged_range_working_days(codes, starts, ends, groups):
+    """
+    Working days of the union of the task ranges of every group: ranges are sorted by group and start,
+    a range opens a new merged range when it starts after every earlier range of its group has ended.
+    """
+    if codes.size == 0:
+        return np.zeros(groups, dtype=np.int64)
+    order = np.lexsort((starts, codes))
+    codes = codes[order]
+    origin = min(starts.min(), ends.min())
+    # groups are laid out one after another on a single time axis, so one running maximum serves all of them
+    group_span = int((max(starts.max(), ends.max()) - origin) // np.timedelta64(1, 'us')) + 1
+    offsets = codes * group_span
+    start_keys = offsets + (starts[order] - origin) // np.timedelta64(1, 'us')
+    end_keys = np.maximum.accumulate(offsets + (ends[order] - origin) // np.timedelta64(1, 'us'))
+    opens = np.empty(codes.size, dtype=bool)
+    opens[0] = True
+    opens[1:] = start_keys[1:] > end_keys[:-1]
+    first_indexes = np.flatnonzero(opens)
+    last_indexes = np.append(first_indexes[1:] - 1, codes.size - 1)
+    merged_codes = codes[first_indexes]
+    merged_starts = starts[order][first_indexes]
+    merged_ends = origin + (end_keys[last_indexes] - offsets[last_indexes]) * np.timedelta64(1, 'us')
+    return group_sum(merged_codes, get_working_days_batch(merged_starts, merged_ends), groups)
+
+
+def group_totals(codes, metrics, groups):
+    undated = np.isnat(metrics.work_start_dates) | np.isnat(metrics.work_end_dates)
+    if undated.any():
+        raise ValueError('Tasks without a work start or end date: ' +
+                         ', '.join(np.array(metrics.keys, dtype=object)[undated].tolist()))
+    # every group has at least one task, the initial values are always replaced
+    first_starts = np.full(groups, np.datetime64('9999-12-31', 'us'))
+    last_ends = np.full(groups, np.datetime64('0001-01-01', 'us'))
+    np.minimum.at(first_starts, codes, metrics.work_start_dates)
+    np.maximum.at(last_ends, codes, metrics.work_end_dates)
+    return GroupTotals(group_sum(codes, metrics.story_points, groups),
+                       group_sum(codes, metrics.estimates, groups),
+                       group_sum(codes, metrics.actual_working_days, groups),
+                       get_working_days_batch(first_starts, last_ends),
+                       merged_range_working_days(codes, metrics.work_start_dates, metrics.work_end_dates, groups),
+                       np.bincount(codes, minlength=groups))
+
+
+def employee_totals(metrics):
+    return group_totals(metrics.employee_codes, metrics, len(metrics.employees))
+
+
+def project_totals(metrics):
+    return group_totals(np.zeros(metrics.employee_codes.size, dtype=np.int64), metrics, 1)
+
+
+def write_parquet(filename, metrics, out_folder='out'):
+    # pandas and pyarrow are only needed for this export
+    import pandas
+
+    if not os.path.exists(out_folder):
+        os.makedirs(out_folder)
+    pandas.DataFrame({
+        'employee': np.array(metrics.employees, dtype=object)[metrics.employee_codes],
+        'key': metrics.keys,
+        'story_points': metrics.story_points,
+        'estimate': metrics.estimates,
+        'actual_working_days': metrics.actual_working_days,
+        'work_start_date': metrics.work_start_dates,
+        'work_end_date': metrics.work_end_dates,
+    }).to_parquet(out_folder + '/' + filename, index=False)
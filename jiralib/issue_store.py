@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import islice
+
+from jiralib import profiling
+
+SyncState = namedtuple('SyncState', 'jql watermark synced_at')
+
+commit_every = 500
+keys_chunk_size = 100
+
+schema = [
+    'CREATE TABLE IF NOT EXISTS issues (key TEXT PRIMARY KEY, updated TEXT, body BLOB)',
+    'CREATE TABLE IF NOT EXISTS queries (jql TEXT PRIMARY KEY, watermark TEXT, synced_at REAL)',
+    'CREATE TABLE IF NOT EXISTS query_issues (jql TEXT, position INTEGER, key TEXT, PRIMARY KEY (jql, position))',
+]
+
+
+def pack_issue(issue_json):
+    return zlib.compress(json.dumps(issue_json, separators=(',', ':')).encode('utf-8'))
+
+
+@profiling.timed('store.unpack')
+def unpack_issue(body):
+    return json.loads(zlib.decompress(body).decode('utf-8'))
+
+
+def get_updated(issue_json):
+    return issue_json['fields'].get('updated') or ''
+
+
+def project_issue(issue_json, fields=None, expand=None):
+    """
+    A stored issue as a search with fields and expand returns it, the store itself keeps whole issues.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    projected_issue = {name: value for (name, value) in issue_json.items() if name not in ('fields', 'changelog')}
+    if fields is None or '*all' in fields:
+        projected_issue['fields'] = issue_json['fields']
+    else:
+        projected_issue['fields'] = {name: issue_json['fields'][name] for name in fields if name in issue_json['fields']}
+    if expand and 'changelog' in expand.split(',') and 'changelog' in issue_json:
+        projected_issue['changelog'] = issue_json['changelog']
+    return projected_issue
+
+
+def to_jql_watermark(updated, overlap_minutes):
+    # jira returns '2020-09-01T10:15:30.000+0300', jql wants minutes in the user time zone,
+    # so the overlap also absorbs the time zone difference
+    watermark = datetime.strptime(updated[:16], '%Y-%m-%dT%H:%M') - timedelta(minutes=overlap_minutes)
+    return watermark.strftime('%Y/%m/%d %H:%M')
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+class IssueStore:
+    """
+    Local copy of search results: raw issue json keyed by issue key, plus the ordered issue keys and the last
+    `updated` watermark of every synced query. A query is served locally while it was synced less than
+    max_age_minutes ago, otherwise only issues updated since the watermark are downloaded again.
+    """
+
+    def __init__(self, path, max_age_minutes=30, overlap_minutes=1440):
+        self.path = path
+        self.max_age = max_age_minutes * 60
+        self.overlap_minutes = overlap_minutes
+        self._local = threading.local()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        with self.connection() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            for statement in schema:
+                connection.execute(statement)
+
+    def connection(self):
+        # sqlite connections must not be shared between threads, pages and sprints are loaded concurrently
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = sqlite3.connect(self.path, timeout=60)
+        return self._local.connection
+
+    def get_sync_state(self, jql):
+        row = self.connection().execute('SELECT jql, watermark, synced_at FROM queries WHERE jql = ?', (jql,)).fetchone()
+        if row is None:
+            return None
+        return SyncState(*row)
+
+    def search(self, jql, fetch_issues, fetch_keys):
+        state = self.get_sync_state(jql)
+        if state is None:
+            return self._full_sync(jql, fetch_issues)
+        if time.time() - state.synced_at > self.max_age:
+            self._delta_sync(state, fetch_issues, fetch_keys)
+        return self.load_issues(jql)
+
+    def is_fresh(self, jql):
+        state = self.get_sync_state(jql)
+        return state is not None and time.time() - state.synced_at <= self.max_age
+
+    def save_issues(self, jql, issues):
+        # issues downloaded elsewhere (the async client) are stored as a full sync of the query
+        return list(self._full_sync(jql, lambda _: issues))
+
+    def load_issues(self, jql):
+        cursor = self.connection().execute(
+            'SELECT i.body FROM query_issues q JOIN issues i ON i.key = q.key WHERE q.jql = ? ORDER BY q.position',
+            (jql,))
+        return map(lambda row: unpack_issue(row[0]), cursor)
+
+    def get_issues(self, keys):
+        # keys the store does not hold are left out, like deleted issues of a live 'key in (...)' search
+        cursor = self.connection().execute('SELECT body FROM issues WHERE key IN (' + ','.join('?' * len(keys)) + ')',
+                                           list(keys))
+        return list(map(lambda row: unpack_issue(row[0]), cursor))
+
+    def _full_sync(self, jql, fetch_issues):
+        keys = []
+        watermark = ''
+        for issue_json in fetch_issues(jql):
+            self._put_issue(issue_json)
+            keys.append(issue_json['key'])
+            watermark = max(watermark, get_updated(issue_json))
+            if len(keys) % commit_every == 0:
+                self.connection().commit()
+            yield issue_json
+        self._save_query(jql, keys, watermark)
+
+    def _delta_sync(self, state, fetch_issues, fetch_keys):
+        watermark = state.watermark
+        fetched_keys = set()
+        if watermark:
+            delta_jql = '(' + state.jql + ') AND updated >= "' + to_jql_watermark(watermark, self.overlap_minutes) + '"'
+            for issue_json in fetch_issues(delta_jql):
+                self._put_issue(issue_json)
+                fetched_keys.add(issue_json['key'])
+                watermark = max(watermark, get_updated(issue_json))
+        # issues may leave or join the query without being updated (relative dates, moved sprints),
+        # so membership is always refreshed with a cheap keys-only search
+        keys = list(fetch_keys(state.jql))
+        known_keys = self._get_query_keys(state.jql)
+        missing_keys = [key for key in keys if key not in known_keys and key not in fetched_keys]
+        for keys_chunk in chunks(missing_keys, keys_chunk_size):
+            for issue_json in fetch_issues('key in (' + ','.join(keys_chunk) + ')'):
+                self._put_issue(issue_json)
+        self._save_query(state.jql, keys, watermark)
+
+    def _get_query_keys(self, jql):
+        return set(map(lambda row: row[0],
+                       self.connection().execute('SELECT key FROM query_issues WHERE jql = ?', (jql,))))
+
+    def _put_issue(self, issue_json):
+        self.connection().execute('INSERT OR REPLACE INTO issues (key, updated, body) VALUES (?, ?, ?)',
+                                  (issue_json['key'], get_updated(issue_json), pack_issue(issue_json)))
+
+    def _save_query(self, jql, keys, watermark):
+        connection = self.connection()
+        with connection:
+            connection.execute('DELETE FROM query_issues WHERE jql = ?', (jql,))
+            connection.executemany('INSERT INTO query_issues (jql, position, key) VALUES (?, ?, ?)',
+                                   ((jql, position, key) for position, key in enumerate(keys)))
+            connection.execute('INSERT OR REPLACE INTO queries (jql, watermark, synced_at) VALUES (?, ?, ?)',
+                               (jql, watermark, time.time()))
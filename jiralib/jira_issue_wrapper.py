@@ -1,8 +1,10 @@
 import urllib
+from collections import namedtuple
 from datetime import datetime
 
 import jira_connector
-from jiralib.pm_calc import get_working_days
+from jiralib import profiling
+from jiralib.pm_calc import Range, get_working_days
 
 jira_datetime_tempalte = '%Y-%m-%d %H:%M:%S.%f'
 jira_date_tempalte = '%Y-%m-%d'
@@ -14,25 +16,105 @@ dev_statuses = ['In Progress', 'In Development']
 
 base_url = jira_connector.settings.get("common", "base_url")
 
+progress_modes = ('all', 'dev', 'qa')
+
+# changelog digest, progress_ranges holds Range tuples per progress mode, end is None while still in progress
+IssueTimeline = namedtuple('IssueTimeline', 'work_start_date work_end_date open_assignee_name progress_ranges')
+
+
+def project_user(user):
+    if user is None:
+        return None
+    return {'name': user['name']}
+
+
+def project_status(status):
+    return {'name': status['name'], 'statusCategory': {'colorName': status['statusCategory']['colorName']}}
+
+
+def project_issue_link(issue_link):
+    projected_link = {'type': {'inward': issue_link['type']['inward'], 'outward': issue_link['type']['outward']}}
+    for direction in ('inwardIssue', 'outwardIssue'):
+        if direction in issue_link:
+            projected_link[direction] = {'key': issue_link[direction]['key']}
+    return projected_link
+
+
+keep_value = (lambda value: value)
+
+# fields read by the wrapper getters and the part of each value they need
+compact_fields = {
+    'summary': keep_value,
+    'description': keep_value,
+    'priority': lambda priority: {name: priority[name] for name in ('id', 'name') if name in priority},
+    'status': project_status,
+    'assignee': project_user,
+    'issuetype': lambda issue_type: {'name': issue_type['name']},
+    'project': lambda project: {'key': project['key'], 'name': project['name']},
+    'customfield_10002': keep_value,
+    'customfield_12000': project_user,
+    'customfield_11000': project_user,
+    'aggregatetimeestimate': keep_value,
+    'aggregatetimeoriginalestimate': keep_value,
+    'issuelinks': lambda issue_links: list(map(project_issue_link, issue_links)),
+    'subtasks': lambda subtasks: list(map(lambda subtask: {'id': subtask['id'], 'key': subtask['key']}, subtasks)),
+    'duedate': keep_value,
+    'resolutiondate': keep_value,
+    'created': keep_value,
+    'updated': keep_value,
+    'progress': keep_value,
+}
+
 
 def wrap_issues(issues_to_wrap):
     return list(map(lambda st: JiraIssueWrapper(st), issues_to_wrap))
 
 
+@profiling.timed('wrapper.wrap')
 def wrap_issue(issue):
     return JiraIssueWrapper(issue)
 
 
+def compact_issue_json(issue_json):
+    fields = issue_json['fields']
+    return {
+        'key': issue_json['key'],
+        'id': issue_json['id'],
+        'fields': {name: projection(fields[name]) if fields.get(name) is not None else None
+                   for (name, projection) in compact_fields.items()}
+    }
+
+
+@profiling.timed('wrapper.wrap')
+def wrap_compact_issue(issue_json):
+    # the changelog is digested right away, so neither the histories nor unused fields are kept
+    wrapped_issue = JiraIssueWrapper(compact_issue_json(issue_json))
+    wrapped_issue._timeline = build_timeline(issue_json['changelog']['histories'], wrapped_issue.get_assignee_name())
+    return wrapped_issue
+
+
+def wrap_issue_with_timeline(issue_json, timeline, compact=False):
+    # the timeline was built from the changelog elsewhere, e.g. by jiralib.timeline_pool
+    wrapped_issue = JiraIssueWrapper(compact_issue_json(issue_json) if compact else issue_json)
+    wrapped_issue._timeline = timeline
+    return wrapped_issue
+
+
 class JiraIssueWrapper:
+    __slots__ = ('issue_json', 'remaining_md', 'full_md_estimate', 'done_md_earned', 'done_md_spent',
+                 'not_earned_md', 'sp_velocity', '_timeline', '_changelog_loader')
+
     def __init__(self, issue):
-        self.issue = issue
-        self.issue_json = issue.raw
+        # search results come as raw json, single issues as jira Resources
+        self.issue_json = getattr(issue, 'raw', issue)
         self.remaining_md = 0
         self.full_md_estimate = 0
         self.done_md_earned = 0
         self.done_md_spent = 0
         self.not_earned_md = 0
         self.sp_velocity = 1
+        self._timeline = None
+        self._changelog_loader = None
 
     def get_remaining_md(self):
         return self.remaining_md
@@ -195,24 +277,46 @@ class JiraIssueWrapper:
     def get_progress(self):
         return self.issue_json['fields']['progress']
 
+    def apply_change(self, issue_json, history=None):
+        # a newer state of the issue, e.g. of a webhook event: the fields are replaced, the timeline grows by history
+        if self._changelog_loader is not None:
+            # the changelog is not loaded yet, once it is it already holds history
+            self.issue_json = compact_issue_json(issue_json) if self._changelog_loader.compact else issue_json
+            return
+        if 'changelog' in self.issue_json:
+            changelog = self.issue_json['changelog']
+            if history is not None:
+                changelog['histories'].append(history)
+            self.issue_json = {**issue_json, 'changelog': changelog}
+        else:
+            self.issue_json = compact_issue_json(issue_json)
+        if history is not None and self._timeline is not None:
+            self._timeline = extend_timeline(self._timeline, history)
+
+    def set_changelog(self, changelog, keep_changelog=True):
+        # the changelog of an issue searched without it, compact issues only keep the timeline
+        if keep_changelog:
+            self.issue_json['changelog'] = changelog
+        self._timeline = build_timeline(changelog['histories'], self.get_assignee_name())
+        self._changelog_loader = None
+
+    def get_timeline(self):
+        changelog_loader = self._changelog_loader
+        while self._timeline is None and changelog_loader is not None:
+            # another thread may be fetching this changelog, a failed fetch is tried again here
+            changelog_loader.load(self.get_key())
+            changelog_loader = self._changelog_loader
+        if self._timeline is None:
+            self._timeline = build_timeline(self.issue_json['changelog']['histories'], self.get_assignee_name())
+        return self._timeline
+
     def get_work_end_date(self):
         if not self.is_done():
             return None
-
-        histories = list(self.issue_json['changelog']['histories'])
-        for history in histories:
-            close_history = to_close_entry(history)
-            if close_history is not None:
-                return to_datetime(close_history['created'])
-        return None
+        return self.get_timeline().work_end_date
 
     def get_work_start_date(self):
-        histories = list(self.issue_json['changelog']['histories'])
-        for history in histories:
-            open_history = from_open_entry(history)
-            if open_history is not None:
-                return to_datetime(open_history['created'])
-        return None
+        return self.get_timeline().work_start_date
 
     def get_actual_working_days(self):
         return self.get_actual_working_days_with_gaps()
@@ -220,14 +324,7 @@ class JiraIssueWrapper:
     def get_open_issue_assignee_name(self):
         if self.is_open():
             return self.get_assignee_name()
-        original_assignee = self.get_assignee_name()
-        histories = list(self.issue_json['changelog']['histories'])
-        for history in histories:
-            original_assignee = get_changed_assignee_name(history) or original_assignee
-            open_history = from_open_entry(history)
-            if open_history is not None:
-                return original_assignee
-        return original_assignee
+        return self.get_timeline().open_assignee_name
 
     def get_dev_actual_working_days_with_gaps(self):
         return self.get_actual_working_days_with_gaps("dev")
@@ -236,18 +333,9 @@ class JiraIssueWrapper:
         return self.get_actual_working_days_with_gaps("qa")
 
     def get_actual_working_days_with_gaps(self, mode="all"):
-        histories = list(self.issue_json['changelog']['histories'])
-        working_days_spent = 0
-        start_date = None
-        for history in histories:
-            if start_date is None and is_start_progress(history, mode):
-                start_date = to_datetime(history['created'])
-            if start_date is not None and is_end_progress(history, mode):
-                working_days_spent = working_days_spent + get_working_days(start_date, to_datetime(history['created']))
-                start_date = None
-        if start_date is not None:
-            working_days_spent = working_days_spent + get_working_days(start_date, datetime.now())  # still in progress
-        return working_days_spent
+        now = datetime.now()  # still in progress
+        return sum(map(lambda progress: get_working_days(progress.start, progress.end or now),
+                       self.get_timeline().progress_ranges[mode]))
 
     def get_actual_working_days_without_gaps(self):
         start_date = self.get_work_start_date()
@@ -259,18 +347,83 @@ class JiraIssueWrapper:
         return get_working_days(start_date, end_date)
 
 
-def to_close_entry(history):
-    for item in history['items']:
-        if item['field'] == 'status' and item['toString'] in closed_statuses:
-            return history
-    return None
-
-
-def is_status_changed(history):
-    for item in history['items']:
-        if item['field'] == 'status':
-            return True
-    return False
+@profiling.timed('wrapper.timeline')
+def build_timeline(histories, assignee_name):
+    # single pass over the changelog, only status changes get their date parsed
+    work_start_date = None
+    work_end_date = None
+    open_assignee_name = assignee_name
+    open_assignee_found = False
+    progress_starts = dict.fromkeys(progress_modes)
+    progress_ranges = {mode: [] for mode in progress_modes}
+    for history in histories:
+        if not open_assignee_found:
+            open_assignee_name = get_changed_assignee_name(history) or open_assignee_name
+        status_changes = get_status_changes(history)
+        if len(status_changes) == 0:
+            continue
+        created = to_datetime(history['created'])
+        if work_end_date is None and is_close_change(status_changes):
+            work_end_date = created
+        if is_from_open_change(status_changes):
+            work_start_date = work_start_date or created
+            open_assignee_found = True
+        for mode in progress_modes:
+            if progress_starts[mode] is None and is_start_progress(status_changes, mode):
+                progress_starts[mode] = created
+            if progress_starts[mode] is not None and is_end_progress(status_changes, mode):
+                progress_ranges[mode].append(Range(progress_starts[mode], created))
+                progress_starts[mode] = None
+    for mode in progress_modes:
+        if progress_starts[mode] is not None:
+            progress_ranges[mode].append(Range(progress_starts[mode], None))
+    return IssueTimeline(work_start_date, work_end_date, open_assignee_name,
+                         {mode: tuple(ranges) for (mode, ranges) in progress_ranges.items()})
+
+
+def extend_timeline(timeline, history):
+    """
+    The timeline of the changelog with history appended, the earlier histories are not read again.
+    """
+    work_start_date = timeline.work_start_date
+    open_assignee_name = timeline.open_assignee_name
+    if work_start_date is None:
+        open_assignee_name = get_changed_assignee_name(history) or open_assignee_name
+    status_changes = get_status_changes(history)
+    if len(status_changes) == 0:
+        return timeline._replace(open_assignee_name=open_assignee_name)
+    created = to_datetime(history['created'])
+    work_end_date = timeline.work_end_date
+    if work_end_date is None and is_close_change(status_changes):
+        work_end_date = created
+    if is_from_open_change(status_changes):
+        work_start_date = work_start_date or created
+    progress_ranges = {}
+    for mode in progress_modes:
+        ranges = list(timeline.progress_ranges[mode])
+        # an open range is a progress still running
+        progress_start = ranges.pop().start if ranges and ranges[-1].end is None else None
+        if progress_start is None and is_start_progress(status_changes, mode):
+            progress_start = created
+        if progress_start is not None and is_end_progress(status_changes, mode):
+            ranges.append(Range(progress_start, created))
+            progress_start = None
+        if progress_start is not None:
+            ranges.append(Range(progress_start, None))
+        progress_ranges[mode] = tuple(ranges)
+    return IssueTimeline(work_start_date, work_end_date, open_assignee_name, progress_ranges)
+
+
+def get_status_changes(history):
+    return [(item['fromString'], item['toString']) for item in history['items'] if item['field'] == 'status']
+
+
+def is_close_change(status_changes):
+    return any(to_status in closed_statuses for (from_status, to_status) in status_changes)
+
+
+def is_from_open_change(status_changes):
+    return any(from_status in open_statuses for (from_status, to_status) in status_changes)
 
 
 def is_in_progress_status(status, mode="all"):
@@ -296,27 +449,14 @@ def get_changed_assignee_name(history):
     return None
 
 
-def from_open_entry(history):
-    for item in history['items']:
-        if item['field'] == 'status' and item['fromString'] in open_statuses:
-            return history
-    return None
-
-
-def is_end_progress(history, mode="all"):
-    for item in history['items']:
-        if item['field'] == 'status' and is_in_progress_status(item['fromString'], mode) and not is_in_progress_status(
-                item['toString'], mode):
-            return True
-    return False
+def is_end_progress(status_changes, mode="all"):
+    return any(is_in_progress_status(from_status, mode) and not is_in_progress_status(to_status, mode)
+               for (from_status, to_status) in status_changes)
 
 
-def is_start_progress(history, mode="all"):
-    for item in history['items']:
-        if item['field'] == 'status' and not is_in_progress_status(item['fromString'], mode) and is_in_progress_status(
-                item['toString'], mode):
-            return True
-    return False
+def is_start_progress(status_changes, mode="all"):
+    return any(not is_in_progress_status(from_status, mode) and is_in_progress_status(to_status, mode)
+               for (from_status, to_status) in status_changes)
 
 
 def to_datetime(datetime_string):
@@ -1,26 +1,30 @@
-import jira_connector
 from jiralib.capacity_calculator import CapacityCalculator
-from jiralib.jira_issue_wrapper import wrap_issues
+from jiralib.columns import compile_header, needs_stage, to_row
+from jiralib.jira_issue_wrapper import wrap_issue
 from jiralib.jira_queries import search_issues
 from jiralib.namedtuple_printer import write_csv
+from jiralib.timeline_pool import wrap_issues_parallel, workers as timeline_workers
 
 
-def convert(list):
-    return (*list, )
-
-def jira_to_tuple(jira, header):
-    columns = []
-    for col in list(header._fields):
-        columns.append(getattr(jira, "get_"+col)())
-    return convert(columns)
+def to_tuple(jira_issues, header):
+    return list(iter_tuples(jira_issues, compile_header(header)))
 
 
-def to_tuple(jira_issues, header):
-    return list(map(lambda jira: jira_to_tuple(jira, header), jira_issues))
+def iter_tuples(jira_issues, plan):
+    return map(lambda jira: to_row(plan, jira), jira_issues)
 
 
-def write_tasks(filename, query, header, capacity_calculator=CapacityCalculator()):
-    jira_issues = wrap_issues(search_issues(query))
-    capacity_calculator.calculate_remaining_work_days_for_tasks(jira_issues)
-    issues_tuple = to_tuple(jira_issues, header)
-    write_csv(filename, header, issues_tuple)
\ No newline at end of file
+def write_tasks(filename, query, header, capacity_calculator=None):
+    # issues flow from the search pages to the csv one by one, nothing is kept once its row is written
+    plan = compile_header(header)
+    issues_json = search_issues(query, plan.fields, plan.expand)
+    if timeline_workers > 0 and needs_stage(plan.stage, 'timeline'):
+        # the timelines the columns read are built by worker processes, rows keep the search order
+        jira_issues = wrap_issues_parallel(issues_json)
+    else:
+        jira_issues = map(wrap_issue, issues_json)
+    # the capacity model costs a long search per project, it is only built when a column reads it
+    if needs_stage(plan.stage, 'capacity'):
+        capacity_calculator = capacity_calculator or CapacityCalculator()
+        jira_issues = map(capacity_calculator.calculate_remaining_work_days_for_task, jira_issues)
+    write_csv(filename, header, iter_tuples(jira_issues, plan))
@@ -1,12 +1,143 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 import jira_connector
+from jiralib import profiling
+from jiralib.changelog_loader import ChangelogLoader
+from jiralib.issue_store import IssueStore, project_issue
+from jiralib.jira_issue_wrapper import wrap_issue, wrap_compact_issue, compact_fields
+from jiralib.timeline_pool import wrap_issues_parallel, workers as timeline_workers
+
+page_size = int(jira_connector.settings.get("search", "page_size", fallback='100'))
+page_workers = int(jira_connector.settings.get("search", "page_workers", fallback='4'))
+# transitions are never read, the changelog is most of a search page already
+issue_expand = 'changelog'
+# ask jira only for the fields the wrappers read and keep compact issues in memory
+compact_search = jira_connector.settings.getboolean("search", "compact", fallback=False)
+# search without changelogs, they are fetched in batches when a timeline is read first
+lazy_changelog = jira_connector.settings.getboolean("search", "lazy_changelog", fallback=False)
+changelog_workers = int(jira_connector.settings.get("search", "changelog_workers", fallback='4'))
+
+issue_store = None
+if jira_connector.settings.getboolean("store", "enabled", fallback=False):
+    issue_store = IssueStore(jira_connector.settings.get("store", "path", fallback='cache/issues.sqlite'),
+                             int(jira_connector.settings.get("store", "max_age_minutes", fallback='30')),
+                             int(jira_connector.settings.get("store", "overlap_minutes", fallback='1440')))
+
+
+def search_page(jql, start_at, max_results=page_size, fields=None, expand=issue_expand, validate_query=True):
+    started = time.perf_counter()
+    page = jira_connector.jira.search_issues(jql, startAt=start_at, maxResults=max_results, fields=fields,
+                                             expand=expand, validate_query=validate_query, json_result=True)
+    if profiling.enabled:
+        # request and json parsing, the http stats hold the request alone
+        profiling.add('search.page', time.perf_counter() - started, items=len(page['issues']))
+    return page
+
+
+def fetch_issues(jql, fields=None, expand=issue_expand, max_results=page_size, validate_query=True):
+    # the first page tells how many issues match and which page size the server really applied
+    first_page = search_page(jql, 0, max_results, fields, expand, validate_query)
+    step = first_page['maxResults'] or len(first_page['issues'])
+    if step == 0:
+        yield from first_page['issues']
+        return
+    page_starts = iter(range(step, first_page['total'], step))
+    executor = ThreadPoolExecutor(max_workers=page_workers)
+    try:
+        # keep at most page_workers pages in flight, yield them in page order as they land
+        pending = deque(executor.submit(search_page, jql, start_at, step, fields, expand, validate_query)
+                        for start_at in islice(page_starts, page_workers))
+        yield from first_page['issues']
+        while pending:
+            page = pending.popleft().result()
+            for start_at in islice(page_starts, 1):
+                pending.append(executor.submit(search_page, jql, start_at, step, fields, expand, validate_query))
+            yield from page['issues']
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_keys(jql):
+    return map(lambda issue: issue['key'], fetch_issues(jql, fields='key', expand=None, max_results=1000))
+
+
+def fetch_changelogs(keys):
+    # deleted or hidden keys are left out instead of failing the chunk
+    return list(fetch_issues('key in (' + ','.join(keys) + ')', 'key', 'changelog', validate_query=False))
+
 
-jira = jira_connector.jira
+def fetch_stored_changelogs(keys):
+    # read on the calling thread, its store connection also sees the rows of a sync it is still streaming,
+    # keys the store does not hold are downloaded instead of getting an empty history
+    issues_json = issue_store.get_issues(keys)
+    stored_keys = set(map(lambda issue_json: issue_json['key'], issues_json))
+    missing_keys = [key for key in keys if key not in stored_keys]
+    return issues_json + fetch_changelogs(missing_keys) if missing_keys else issues_json
 
 
-def search_issues(jql):
-    issues_list = jira.search_issues(jql,expand='changelog,transitions,history',maxResults=10000)
-    return issues_list
+def wrap_lazy_issue(issue_json, compact=compact_search):
+    # an issue that came without its changelog, e.g. in a webhook event, the changelog is downloaded on first use
+    return ChangelogLoader(fetch_changelogs, compact, 1, page_size).wrap(issue_json)
+
+
+def search_issues(jql, fields=None, expand=issue_expand, use_store=True):
+    if issue_store is None or not use_store:
+        return fetch_issues(jql, fields, expand)
+    # the store syncs whole issues with their changelog, fields and expand are applied to what it returns
+    return map(lambda issue_json: project_issue(issue_json, fields, expand),
+               issue_store.search(jql, fetch_issues, fetch_keys))
+
+
+def search_wrapped_issues(jql, compact=compact_search, lazy=lazy_changelog, use_store=True):
+    # use_store=False always asks jira, e.g. for pages refreshed more often than the store max age
+    use_store = use_store and issue_store is not None
+    if lazy:
+        # stored changelogs are read from the store, live ones downloaded, both only once a timeline is needed;
+        # the store is read by the thread loading the timeline, a worker connection would miss the streaming sync
+        if use_store:
+            loader = ChangelogLoader(fetch_stored_changelogs, compact, 1, page_size)
+        else:
+            loader = ChangelogLoader(fetch_changelogs, compact, changelog_workers, page_size)
+        return loader.wrap_all(search_issues(jql, list(compact_fields) if compact else None, None, use_store))
+    if timeline_workers > 0:
+        # timelines are built by worker processes, the issues come out in search order
+        return wrap_issues_parallel(search_issues(jql, list(compact_fields) if compact else None, use_store=use_store),
+                                    compact)
+    if compact:
+        return map(wrap_compact_issue, search_issues(jql, list(compact_fields), use_store=use_store))
+    return map(wrap_issue, search_issues(jql, use_store=use_store))
+
+
+def get_project_done_tasks_jql(project_name):
+    return 'project = ' + project_name + ' AND "Story Points"  is not empty and statusCategory = done and status !="Ready for Test" and created >= -180d'
 
 
 def get_project_done_tasks_with_story_points(project_name):
-    return search_issues('project = ' + project_name + ' AND "Story Points"  is not empty and statusCategory = done and status !="Ready for Test" and created >= -180d')
+    return search_wrapped_issues(get_project_done_tasks_jql(project_name))
+
+
+async def search_issues_async(jira, jql, fields=None, expand=issue_expand):
+    # jira is an open jiralib.async_jira.AsyncJira
+    if issue_store is None:
+        return await jira.search_issues(jql, fields, expand, page_size)
+    # a fresh query is served by the store, otherwise it is downloaded whole and stored again
+    if issue_store.is_fresh(jql):
+        issues = await asyncio.to_thread(lambda: list(issue_store.load_issues(jql)))
+    else:
+        issues = await jira.search_issues(jql, expand=issue_expand, max_results=page_size)
+        issues = await asyncio.to_thread(issue_store.save_issues, jql, issues)
+    return list(map(lambda issue_json: project_issue(issue_json, fields, expand), issues))
+
+
+async def search_wrapped_issues_async(jira, jql, compact=compact_search):
+    if compact:
+        return list(map(wrap_compact_issue, await search_issues_async(jira, jql, list(compact_fields))))
+    return list(map(wrap_issue, await search_issues_async(jira, jql)))
+
+
+async def get_project_done_tasks_with_story_points_async(jira, project_name):
+    return await search_wrapped_issues_async(jira, get_project_done_tasks_jql(project_name))
@@ -0,0 +1,213 @@
+import html
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jira_connector
+from jiralib.sprint import BoardDirectory, get_first_active_sprints
+from jiralib.webhooks import apply_event
+
+host = jira_connector.settings.get("monitoring", "host", fallback='127.0.0.1')
+port = int(jira_connector.settings.get("monitoring", "port", fallback='8080'))
+refresh_seconds = float(jira_connector.settings.get("monitoring", "refresh_minutes", fallback='5')) * 60
+boards_refresh_seconds = float(jira_connector.settings.get("monitoring", "boards_refresh_minutes", fallback='1440')) * 60
+
+page_template = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>body{{font-family:sans-serif;margin:2em}} table{{border-collapse:collapse}} td,th{{padding:2px 8px;border-bottom:1px solid #ddd;text-align:left}}
+.text-danger{{color:#c00}} .text-warning{{color:#b70}} .muted{{color:#888}}</style></head>
+<body>{body}<p class="muted">Refreshed {refreshed}</p></body></html>'''
+
+
+def escape(value):
+    return html.escape(str(value if value is not None else ''))
+
+
+def render_page(title, body, refreshed):
+    return page_template.format(title=escape(title), body=body, refreshed=escape(refreshed)).encode('utf-8')
+
+
+def render_issue_row(issue):
+    return ('<tr><td><a href="' + escape(jira_connector.base_url + '/browse/' + issue.get_key()) + '">' +
+            escape(issue.get_key()) + '</a></td><td>' + escape(issue.get_summary()) + '</td><td>' +
+            escape(issue.get_assignee_name()) + '</td><td>' + issue.get_status_html() + '</td><td>' +
+            escape(issue.get_story_points()) + '</td></tr>')
+
+
+def render_sprint(sprint):
+    return ''.join([
+        '<h1>' + escape(sprint.board_name) + '</h1>',
+        '<h2>' + escape(sprint.name) + '</h2>',
+        '<p>' + escape(sprint.goal) + '</p>' if sprint.goal else '',
+        '<p>' + escape(sprint.start_date.date()) + ' - ' + escape(sprint.end_date.date()) + ', ' +
+        escape(sprint.days_passed) + ' of ' + escape(sprint.days_passed + sprint.days_remaining) + ' days passed</p>',
+        '<p>Story points: ' + escape(sprint.total_sp()) +
+        ', <a href="' + escape(sprint.open_issues_url) + '">open</a> ' + escape(sprint.open_sp()) +
+        ' (' + ('%.0f' % sprint.open_sp_percent()) + '%)' +
+        ', <a href="' + escape(sprint.in_progress_issues_url) + '">in progress</a> ' + escape(sprint.in_progress_sp()) +
+        ' (' + ('%.0f' % sprint.in_progress_sp_percent()) + '%)' +
+        ', <a href="' + escape(sprint.closed_issues_url) + '">done</a> ' + escape(sprint.done_sp()) +
+        ' (' + ('%.0f' % sprint.done_sp_percent()) + '%)</p>',
+        '<p>' + '<br>'.join(sprint.get_html_alerts()) + '</p>',
+        '<table><tr><th>Key</th><th>Summary</th><th>Assignee</th><th>Status</th><th>SP</th></tr>',
+        ''.join(map(render_issue_row, sprint.sprint_issues)),
+        '</table>',
+    ])
+
+
+class MonitoringService:
+    """
+    Keeps the board directory and the active sprints of the boards in memory, refreshes them every refresh_seconds
+    in a background thread and renders the pages right away: a page load only reads prepared bytes.
+    Jira webhooks posted to /webhook patch the sprints in between, the pages of changed boards are rendered again
+    on their next load.
+    """
+
+    def __init__(self, board_ids, refresh_interval=refresh_seconds, boards_refresh_interval=boards_refresh_seconds):
+        self.board_ids = list(board_ids)
+        self.refresh_interval = refresh_interval
+        self.boards_refresh_interval = boards_refresh_interval
+        self.boards = BoardDirectory()
+        self.boards_refreshed = time.monotonic()
+        self.sprints = {}
+        self.errors = {}
+        self.pages = {}
+        self.refreshed = ''
+        self.stale_pages = set()
+        # webhook events received while a refresh searches the sprints, None outside of a refresh
+        self.refresh_events = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def refresh(self):
+        if time.monotonic() - self.boards_refreshed > self.boards_refresh_interval:
+            self.boards.refresh()
+            self.boards_refreshed = time.monotonic()
+        with self.lock:
+            self.refresh_events = []
+        try:
+            # the store answers for max_age_minutes, the dashboard asks jira on every refresh
+            board_sprints = get_first_active_sprints(self.board_ids, boards=self.boards, use_store=False)
+        except BaseException:
+            with self.lock:
+                self.refresh_events = None
+            raise
+        with self.lock:
+            for board_sprint in board_sprints:
+                # a failed board keeps showing its last sprint next to the error
+                if board_sprint.error is None:
+                    self.sprints[board_sprint.board_id] = board_sprint.sprint
+                    self.errors.pop(board_sprint.board_id, None)
+                else:
+                    self.errors[board_sprint.board_id] = board_sprint.error
+            # the searches may have run before these events, events the new sprints already hold are skipped
+            new_sprints = [board_sprint.sprint for board_sprint in board_sprints if board_sprint.error is None]
+            for event in self.refresh_events:
+                apply_event(new_sprints, event)
+            self.refresh_events = None
+            self.refreshed = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.pages = self.render_pages()
+            self.stale_pages.clear()
+
+    def render_pages(self):
+        pages = {'/': self.render_index_page()}
+        for board_id in self.board_ids:
+            pages['/board/' + board_id] = self.render_board_page(board_id)
+        return pages
+
+    def render_index_page(self):
+        return render_page('Boards', self.render_index(), self.refreshed)
+
+    def render_board_page(self, board_id):
+        body = ''
+        if board_id in self.errors:
+            body += '<p class="text-danger">Refresh failed: ' + escape(self.errors[board_id]) + '</p>'
+        sprint = self.sprints.get(board_id)
+        body += render_sprint(sprint) if sprint is not None else '<p>No active sprint loaded</p>'
+        return render_page(sprint.board_name if sprint else 'Board ' + board_id, body, self.refreshed)
+
+    def apply_event(self, event):
+        with self.lock:
+            if self.refresh_events is not None:
+                self.refresh_events.append(event)
+            changed_sprints = apply_event(list(self.sprints.values()), event)
+            for (board_id, sprint) in self.sprints.items():
+                if sprint in changed_sprints:
+                    self.stale_pages.update(['/', '/board/' + board_id])
+            return len(changed_sprints)
+
+    def render_index(self):
+        rows = []
+        for board_id in self.board_ids:
+            sprint = self.sprints.get(board_id)
+            rows.append('<tr><td><a href="/board/' + escape(board_id) + '">' +
+                        escape(sprint.board_name if sprint else board_id) + '</a></td><td>' +
+                        escape(sprint.name if sprint else '') + '</td><td>' +
+                        ('%.0f' % sprint.done_sp_percent() + '%' if sprint else '') + '</td><td>' +
+                        '<br>'.join(sprint.get_html_alerts() if sprint else []) +
+                        ('<span class="text-danger">Refresh failed</span>' if board_id in self.errors else '') +
+                        '</td></tr>')
+        return ('<h1>Boards</h1><table><tr><th>Board</th><th>Sprint</th><th>Done</th><th>Alerts</th></tr>' +
+                ''.join(rows) + '</table>')
+
+    def refresh_loop(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as error:
+                print('Refresh failed: ' + str(error))
+
+    def get_page(self, path):
+        path = path.rstrip('/') or '/'
+        if path in self.stale_pages:
+            with self.lock:
+                if path in self.stale_pages:
+                    self.stale_pages.discard(path)
+                    self.pages[path] = self.render_index_page() if path == '/' else \
+                        self.render_board_page(path[len('/board/'):])
+        return self.pages.get(path)
+
+    def serve(self, server_host=host, server_port=port):
+        self.refresh()
+        threading.Thread(target=self.refresh_loop, daemon=True).start()
+        server = ThreadingHTTPServer((server_host, server_port), to_request_handler(self))
+        print('Serving http://' + server_host + ':' + str(server.server_port) + '/')
+        try:
+            server.serve_forever()
+        finally:
+            self.stop_event.set()
+            server.server_close()
+
+
+def to_request_handler(service):
+    class MonitoringRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            page = service.get_page(self.path.split('?')[0])
+            if page is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def do_POST(self):
+            if self.path.split('?')[0] != '/webhook':
+                self.send_error(404)
+                return
+            try:
+                event = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                service.apply_event(event)
+            except (ValueError, KeyError, TypeError) as error:
+                self.send_error(400, str(error))
+                return
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return MonitoringRequestHandler
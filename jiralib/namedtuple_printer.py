@@ -1,17 +1,23 @@
 import csv
 import os
 
+from jiralib import profiling
 
-def write_csv(filename, header, records, out_folder='out'):
+
+def write_csv(filename, header, records, out_folder='out', flush_every=100):
     if not os.path.exists(out_folder):
         os.makedirs(out_folder)
 
     with open(out_folder + "/" + filename, mode='w') as csv_file:
         csv_writer = csv.writer(csv_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
 
-        csv_writer.writerow(list(header._fields))
-        for record in records:
-            csv_writer.writerow(list(record))
+        write_row = profiling.timed('export.csv_write')(csv_writer.writerow)
+        write_row(list(header._fields))
+        # records may be a lazy stream, rows reach the disk while the rest is still being fetched
+        for (number, record) in enumerate(records, start=1):
+            write_row(list(record))
+            if number % flush_every == 0:
+                csv_file.flush()
 
 #TestTuple = namedtuple('TestTuple', 'employee task')
 #write_csv("test.csv", TestTuple, [TestTuple('qwe','task1'), TestTuple('asd','task2')])
@@ -3,11 +3,19 @@ from collections import namedtuple
 from datetime import timedelta, datetime
 from functools import reduce
 
-import workdays
+from jiralib import profiling
+from jiralib.business_calendar import BusinessCalendar
 
 
 Range = namedtuple('Range', ['start', 'end'])
 
+calendar = BusinessCalendar()
+
+
+def set_holidays(holidays):
+    global calendar
+    calendar = BusinessCalendar(holidays)
+
 
 def to_calendar_days(working_days):
     rest = working_days % 5
@@ -21,8 +29,17 @@ def to_working_days(calendar_days):
     return weeks * 5 + min(rest, 5)
 
 
+@profiling.timed('pm_calc.working_days')
 def get_working_days(fromdate, todate):
-    return workdays.networkdays( fromdate, todate )
+    return calendar.working_days(fromdate, todate)
+
+
+def get_working_days_batch(fromdates, todates):
+    return calendar.working_days_batch(fromdates, todates)
+
+
+def add_working_days_batch(start_date, working_days):
+    return calendar.add_working_days_batch(start_date, working_days)
 
 
 def square_min(base_estimate):
@@ -42,7 +59,7 @@ def merge_timeranges(list_of_ranges):
             current = range
         else:
             if current.end >= range.start:
-                current = current._replace(end=range.end)
+                current = current._replace(end=max(current.end, range.end))
             else:
                 merged_ranges.append(current)
                 current = range
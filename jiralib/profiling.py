@@ -0,0 +1,108 @@
+import atexit
+import configparser
+import json
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+# read here and not through jira_connector: pm_calc is profiled and is imported while jira_connector loads
+settings = configparser.ConfigParser()
+settings.read('jira.ini')
+
+enabled = '--profile' in sys.argv or settings.getboolean("profiling", "enabled", fallback=False)
+json_file = settings.get("profiling", "json_file", fallback='')
+
+started = time.perf_counter()
+stats = {}
+stats_lock = threading.Lock()
+disabled_timer = nullcontext()
+
+
+def add(name, seconds=0.0, size=0, items=0):
+    with stats_lock:
+        stat = stats.get(name)
+        if stat is None:
+            stat = stats[name] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0, 'items': 0}
+        stat['calls'] += 1
+        stat['seconds'] += seconds
+        stat['max_seconds'] = max(stat['max_seconds'], seconds)
+        stat['bytes'] += size
+        stat['items'] += items
+
+
+class Timer:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add(self.name, time.perf_counter() - self.started)
+
+
+def timer(name):
+    if not enabled:
+        return disabled_timer
+    return Timer(name)
+
+
+def timed(name):
+    """
+    Decorator adding the time of every call to the stat name. Decided when the module is loaded: with profiling
+    disabled the function is returned as is and costs nothing.
+    """
+    def decorate(function):
+        if not enabled:
+            return function
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            call_started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(name, time.perf_counter() - call_started)
+        return timed_function
+    return decorate
+
+
+def snapshot():
+    with stats_lock:
+        return {name: dict(stat) for (name, stat) in stats.items()}
+
+
+def print_summary(out=sys.stderr):
+    current_stats = snapshot()
+    # times are inclusive, a stage called from another one is counted in both
+    print('Profile, wall time ' + ('%.2f' % (time.perf_counter() - started)) + 's', file=out)
+    print('%-40s %8s %10s %10s %10s %12s %8s' % ('stat', 'calls', 'total s', 'avg ms', 'max ms', 'bytes', 'items'),
+          file=out)
+    for (name, stat) in sorted(current_stats.items(), key=lambda item: -item[1]['seconds']):
+        print('%-40s %8d %10.3f %10.3f %10.3f %12d %8d' % (
+            name[:40], stat['calls'], stat['seconds'], stat['seconds'] * 1000 / max(stat['calls'], 1),
+            stat['max_seconds'] * 1000, stat['bytes'], stat['items']), file=out)
+
+
+def dump_json(filename):
+    # one json line per run, runs of the same script can be compared over time
+    with open(filename, mode='a', encoding='utf-8') as profile_file:
+        profile_file.write(json.dumps({
+            'time': time.time(),
+            'argv': sys.argv,
+            'wall_seconds': time.perf_counter() - started,
+            'stats': snapshot(),
+        }) + '\n')
+
+
+def report():
+    print_summary()
+    if json_file:
+        dump_json(json_file)
+
+
+if enabled:
+    atexit.register(report)
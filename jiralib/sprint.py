@@ -1,25 +1,28 @@
+import asyncio
+import threading
+import time
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from functools import reduce
-
 import jira_connector
-from jiralib.jira_issue_wrapper import wrap_issues, to_datetime, jql_build_encoded_url
-from jiralib.jira_queries import search_issues
+from jiralib import profiling
+from jiralib.jira_issue_wrapper import to_datetime, jql_build_encoded_url, open_statuses, closed_statuses
+from jiralib.async_jira import AsyncJira
+from jiralib.jira_queries import search_wrapped_issues, search_wrapped_issues_async, wrap_lazy_issue
 from jiralib.pm_calc import get_working_days
 
-sum_operation = lambda a,b: a + b
-story_points_lambda = (lambda task: task.get_story_points() or 0)
-sp_8_or_bigger = (lambda task: (task.get_story_points() or 0) >= 8)
-sp_5_or_bigger = (lambda task: (task.get_story_points() or 0) >= 5)
+open_status_set = frozenset(open_statuses)
+closed_status_set = frozenset(closed_statuses)
+
 # risk rules
 finished_sprint_to_be_closed = lambda sprint: sprint.days_remaining < 0
 finished_sprint = lambda sprint: sprint.total_sp() > sprint.done_sp() and sprint.days_remaining <= 0
-opened_sprint_not_estimated = lambda sprint: len(sprint.get_not_estimated_issues()) > 0
+opened_sprint_not_estimated = lambda sprint: sprint.snapshot.not_estimated_count > 0
 sprint_start_open_issues = (lambda sprint: sprint.early_sprint() and sprint.open_sp() > sprint.total_sp() * 0.50)
-start_sprint_big_open = (lambda sprint: sprint.early_sprint() and len(list(filter(sp_8_or_bigger, sprint.get_open_issues()))) > 0)
+start_sprint_big_open = (lambda sprint: sprint.early_sprint() and sprint.snapshot.open_8_or_bigger_count > 0)
 mid_sprint_open_issues = (lambda sprint: sprint.mid_sprint() and sprint.open_sp() > sprint.total_sp() * 0.25)
-mid_sprint_big_open = (lambda sprint: sprint.mid_sprint() and len(list(filter(sp_5_or_bigger, sprint.get_open_issues()))) > 0)
+mid_sprint_big_open = (lambda sprint: sprint.mid_sprint() and sprint.snapshot.open_5_or_bigger_count > 0)
 freeze_sprint_open_issues = (lambda sprint: sprint.feature_freeze() and sprint.open_sp() > 0)
 freeze_closed = (lambda sprint: sprint.feature_freeze() and sprint.done_sp() < sprint.total_sp() * 0.50)
 
@@ -43,47 +46,215 @@ closed_issues_jql = ' and status in ("Done","Closed","Verified","Resolved", "Rel
 in_progress_jql = ' and status not in ("Open", "To Do", "Reopened", "Backlog", "Ready for Development", "In Analysis", "Done","Closed","Verified","Resolved", "Released", "Ready for Merge")'
 
 
-def get_first_active_sprint(board_id):
-    board = list(filter(lambda x: x.id == int(board_id), jira_connector.jira.boards(maxResults=1000, type='scrum')))[0]
+SprintSnapshot = namedtuple('SprintSnapshot',
+                            'open_count in_progress_count done_count open_sp in_progress_sp done_sp total_sp '
+                            'open_5_or_bigger_count open_8_or_bigger_count not_estimated_count')
+
+board_timeout = int(jira_connector.settings.get("monitoring", "board_timeout_seconds", fallback='300'))
+
+BoardSprint = namedtuple('BoardSprint', 'board_id sprint error')
+
+
+class BoardDirectory:
+    def __init__(self, board_type='scrum'):
+        self.board_type = board_type
+        self.boards = None
+        self.lock = threading.Lock()
+
+    def get_boards(self):
+        # downloaded once, concurrent callers wait for the first download
+        with self.lock:
+            if self.boards is None:
+                self.boards = {board.id: board for board in
+                               jira_connector.jira.boards(maxResults=1000, type=self.board_type)}
+            return self.boards
+
+    def get_board(self, board_id):
+        return self.get_boards()[int(board_id)]
+
+    def refresh(self):
+        with self.lock:
+            self.boards = None
+
+
+board_directory = BoardDirectory()
+
+
+@profiling.timed('sprint.snapshot')
+def build_snapshot(issues):
+    # one pass over the sprint issues, every rule and statistic reads the result
+    open_count = in_progress_count = done_count = 0
+    open_sp = in_progress_sp = done_sp = 0
+    open_5_or_bigger_count = open_8_or_bigger_count = not_estimated_count = 0
+    for issue in issues:
+        status = issue.get_status()
+        story_points = issue.get_story_points() or 0
+        if status in closed_status_set:
+            done_count += 1
+            done_sp += story_points
+            continue
+        if not issue.is_estimated():
+            not_estimated_count += 1
+        if status in open_status_set:
+            open_count += 1
+            open_sp += story_points
+            open_5_or_bigger_count += story_points >= 5
+            open_8_or_bigger_count += story_points >= 8
+        else:
+            in_progress_count += 1
+            in_progress_sp += story_points
+    return SprintSnapshot(open_count, in_progress_count, done_count, open_sp, in_progress_sp, done_sp,
+                          open_sp + in_progress_sp + done_sp,
+                          open_5_or_bigger_count, open_8_or_bigger_count, not_estimated_count)
+
+
+def add_to_snapshot(snapshot, issue, sign=1):
+    # every statistic is a sum over the issues, one issue joins (sign 1) or leaves (sign -1) without a new pass
+    issue_snapshot = build_snapshot([issue])
+    return SprintSnapshot(*map(lambda total, part: total + sign * part, snapshot, issue_snapshot))
+
+
+def is_not_newer(issue_json, issue):
+    updated = issue_json['fields'].get('updated')
+    known_updated = issue.get_fields().get('updated')
+    return updated is not None and known_updated is not None and updated <= known_updated
+
+
+def get_first_active_sprint(board_id, boards=board_directory, use_store=True):
+    board = boards.get_board(board_id)
     active_sprint = jira_connector.jira.sprints(board_id=int(board_id), state='active', maxResults=10000)[0]
-    return Sprint(active_sprint, board.name)
+    return Sprint(active_sprint, board.name, use_store=use_store)
+
+
+def get_first_active_sprints(board_ids, timeout=board_timeout, boards=board_directory, use_store=True):
+    """
+    The active sprint of every board, loaded concurrently. Boards share one deadline: a board without an answer by then
+    is reported with a TimeoutError. The timeout bounds when the results are returned, not how long the process runs,
+    the requests of a late board are not interrupted and its thread finishes them before the process exits.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(len(board_ids), 1))
+    try:
+        futures = list(map(lambda board_id: executor.submit(get_first_active_sprint, board_id, boards, use_store),
+                                board_ids))
+        deadline = time.monotonic() + timeout
+        board_sprints = []
+        for (board_id, future) in zip(board_ids, futures):
+            try:
+                board_sprints.append(BoardSprint(board_id, future.result(max(deadline - time.monotonic(), 0)), None))
+            except Exception as error:
+                board_sprints.append(BoardSprint(board_id, None, error))
+        return board_sprints
+    finally:
+        # boards not started yet are dropped, the running ones are left to finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def get_first_active_sprint_async(jira, board_id, boards):
+    active_sprint = (await jira.sprints(int(board_id), state='active'))[0]
+    sprint_issues = await search_wrapped_issues_async(jira, 'Sprint = ' + str(active_sprint['id']))
+    return Sprint(active_sprint, boards[int(board_id)]['name'], sprint_issues)
+
+
+async def get_first_active_sprints_async(board_ids, timeout=board_timeout, jira=None):
+    if jira is None:
+        async with AsyncJira() as jira:
+            return await get_first_active_sprints_async(board_ids, timeout, jira)
+    boards = {board['id']: board for board in await jira.boards()}
+    tasks = list(map(lambda board_id: asyncio.ensure_future(get_first_active_sprint_async(jira, board_id, boards)),
+                     board_ids))
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+    board_sprints = []
+    for (board_id, task) in zip(board_ids, tasks):
+        if not task.done():
+            task.cancel()
+            board_sprints.append(BoardSprint(board_id, None, TimeoutError('No answer in ' + str(timeout) + 's')))
+        elif task.exception() is not None:
+            board_sprints.append(BoardSprint(board_id, None, task.exception()))
+        else:
+            board_sprints.append(BoardSprint(board_id, task.result(), None))
+    return board_sprints
 
 
 class Sprint:
 
-    def __init__(self, sprint, board_name='Unknown'):
-        self.sprint_json = sprint.raw
-        self.start_date = to_datetime(sprint.startDate.replace('Z',''))
-        self.end_date = to_datetime(sprint.endDate.replace('Z',''))
-        self.sprint_issues = wrap_issues(
-            search_issues('Sprint = ' + str(sprint.id))
-        )
+    def __init__(self, sprint, board_name='Unknown', sprint_issues=None, use_store=True):
+        # jira Sprint resources and raw sprint json of the async client alike
+        self.sprint_json = getattr(sprint, 'raw', sprint)
+        self.start_date = to_datetime(self.sprint_json['startDate'].replace('Z',''))
+        self.end_date = to_datetime(self.sprint_json['endDate'].replace('Z',''))
+        if sprint_issues is None:
+            # the rules read fields only, with [search] lazy_changelog the changelogs wait until a timeline is read
+            sprint_issues = search_wrapped_issues('Sprint = ' + str(self.sprint_json['id']), use_store=use_store)
+        self.issues_by_key = {issue.get_key(): issue for issue in sprint_issues}
+        self.snapshot = build_snapshot(self.issues_by_key.values())
         self.days_passed = get_working_days(self.start_date, datetime.now())
         self.days_remaining = get_working_days(datetime.now(), self.end_date)
+        self.triggered_rules = self._evaluate_rules()
         self.alerts = self._calculate_alerts()
         self.board_name = board_name
-        self.name = sprint.name
-        self.board_id = sprint.originBoardId
-        self.goal = sprint.raw.get('goal') or ''
-        self.open_issues_url = jql_build_encoded_url('Sprint = ' + str(sprint.id) + open_issues_jql)
-        self.in_progress_issues_url = jql_build_encoded_url('Sprint = ' + str(sprint.id) + in_progress_jql)
-        self.closed_issues_url = jql_build_encoded_url('Sprint = ' + str(sprint.id) + closed_issues_jql)
+        self.name = self.sprint_json['name']
+        self.board_id = self.sprint_json.get('originBoardId')
+        self.goal = self.sprint_json.get('goal') or ''
+        sprint_jql = 'Sprint = ' + str(self.sprint_json['id'])
+        self.open_issues_url = jql_build_encoded_url(sprint_jql + open_issues_jql)
+        self.in_progress_issues_url = jql_build_encoded_url(sprint_jql + in_progress_jql)
+        self.closed_issues_url = jql_build_encoded_url(sprint_jql + closed_issues_jql)
+
+    @property
+    def sprint_issues(self):
+        return list(self.issues_by_key.values())
+
+    def get_id(self):
+        return self.sprint_json['id']
+
+    def put_issue(self, issue_json, history=None):
+        """
+        Adds an issue or updates it from newer json, e.g. of a webhook event. Only this issue is counted again.
+        """
+        key = issue_json['key']
+        issue = self.issues_by_key.get(key)
+        if issue is not None and is_not_newer(issue_json, issue):
+            # an event the issue already holds, e.g. applied again after a refresh that started before it
+            return
+        if issue is None:
+            # an event only holds its own history, the whole changelog is fetched when a timeline is read
+            issue = wrap_lazy_issue(issue_json)
+        else:
+            self.snapshot = add_to_snapshot(self.snapshot, issue, -1)
+            issue.apply_change(issue_json, history)
+        self.issues_by_key[key] = issue
+        self.snapshot = add_to_snapshot(self.snapshot, issue)
+        self._update_alerts()
+
+    def remove_issue(self, key):
+        issue = self.issues_by_key.pop(key, None)
+        if issue is None:
+            return False
+        self.snapshot = add_to_snapshot(self.snapshot, issue, -1)
+        self._update_alerts()
+        return True
+
+    def _update_alerts(self):
+        self.triggered_rules = self._evaluate_rules()
+        self.alerts = self._calculate_alerts()
+
+    def _evaluate_rules(self):
+        return list(filter(lambda validation_rule: validation_rule.rule(self), validation_rules))
 
     def _calculate_alerts(self):
         alerts = []
-        for validation_rule in validation_rules:
-            if validation_rule.rule(self):
-                alerts.append(validation_rule.severity + ': ' + validation_rule.text)
+        for validation_rule in self.triggered_rules:
+            alerts.append(validation_rule.severity + ': ' + validation_rule.text)
         return alerts
 
     def get_html_alerts(self):
         alerts = []
-        for validation_rule in validation_rules:
-            if validation_rule.rule(self):
-                if validation_rule.severity == 'Critical':
-                    alerts.append('<a href="#" class="text-danger">' + validation_rule.severity + ': ' + validation_rule.text + '</a>')
-                else:
-                    alerts.append('<a href="#" class="text-warning">' + validation_rule.severity + ': ' + validation_rule.text + '</a>')
+        for validation_rule in self.triggered_rules:
+            if validation_rule.severity == 'Critical':
+                alerts.append('<a href="#" class="text-danger">' + validation_rule.severity + ': ' + validation_rule.text + '</a>')
+            else:
+                alerts.append('<a href="#" class="text-warning">' + validation_rule.severity + ': ' + validation_rule.text + '</a>')
         return alerts
 
     def print_stats(self):
@@ -115,16 +286,16 @@ class Sprint:
         return list(filter(lambda issue: not issue.is_estimated() and not issue.is_done(), self.sprint_issues))
 
     def done_sp(self):
-        return reduce(sum_operation, list(map(story_points_lambda, self.get_done_issues())), 0)
+        return self.snapshot.done_sp
 
     def in_progress_sp(self):
-        return reduce(sum_operation, list(map(story_points_lambda, self.get_in_progress_issues())), 0)
+        return self.snapshot.in_progress_sp
 
     def open_sp(self):
-        return reduce(sum_operation, list(map(story_points_lambda, self.get_open_issues())), 0)
+        return self.snapshot.open_sp
 
     def total_sp(self):
-        return self.open_sp() + self.in_progress_sp() + self.done_sp()
+        return self.snapshot.total_sp
 
     def feature_freeze(self):
         return (self.days_passed + self.days_remaining) * 0.75 < self.days_passed
@@ -0,0 +1,208 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import jira_connector
+from jiralib.file_cache import read_json, write_json
+from jiralib.jira_issue_wrapper import get_status_changes, to_datetime
+from jiralib.jira_queries import page_size, page_workers, search_issues
+from jiralib.sprint import closed_status_set, open_status_set
+from jiralib.webhooks import get_sprint_ids, sprint_field
+
+last_sprints = int(jira_connector.settings.get("sprint_history", "last_sprints", fallback='6'))
+history_cache_folder = jira_connector.settings.get("sprint_history", "cache_folder", fallback='cache/sprint_history')
+# a stored sprint is only reused when it was calculated the same way
+history_version = 1
+history_fields = ['status', 'customfield_10002', sprint_field]
+
+open_code = 0
+in_progress_code = 1
+done_code = 2
+
+SprintVelocity = namedtuple('SprintVelocity', 'board_id sprint_id name start_date end_date committed_sp completed_sp')
+BurndownDay = namedtuple('BurndownDay', 'board_id sprint_id name date open_sp in_progress_sp done_sp')
+SprintBurndown = namedtuple('SprintBurndown', 'sprint_id name start_date end_date days open_sp in_progress_sp done_sp')
+
+
+def status_code(status):
+    if status in closed_status_set:
+        return done_code
+    if status in open_status_set:
+        return open_code
+    return in_progress_code
+
+
+def to_minutes(moments):
+    return np.array(moments, dtype='datetime64[m]').astype(np.int64)
+
+
+def get_sprint_end(sprint_json):
+    # a sprint closed early or late ends when it was completed
+    return to_datetime((sprint_json.get('completeDate') or sprint_json['endDate']).replace('Z', ''))
+
+
+def get_closed_sprints(board_id, last=last_sprints):
+    sprints = jira_connector.jira.sprints(board_id=int(board_id), state='closed', maxResults=10000)
+    sprints_json = sorted(map(lambda sprint: sprint.raw, sprints), key=get_sprint_end)
+    return sprints_json[-last:] if last else sprints_json
+
+
+def get_history_cache_file(sprint_id):
+    return os.path.join(history_cache_folder, str(sprint_id) + '.json')
+
+
+def load_burndown(sprint_id):
+    stored = read_json(get_history_cache_file(sprint_id))
+    if stored is None or stored.get('key') != history_version:
+        return None
+    return SprintBurndown(*stored['burndown'])
+
+
+def save_burndown(burndown):
+    # closed sprints never change, a stored burndown has no expiry
+    write_json(get_history_cache_file(burndown.sprint_id), {'key': history_version, 'burndown': list(burndown)})
+
+
+def get_sprint_days(sprint_json):
+    start = to_datetime(sprint_json['startDate'].replace('Z', ''))
+    end = get_sprint_end(sprint_json)
+    days = [start.date() + timedelta(days=day) for day in range((end.date() - start.date()).days + 1)]
+    # every day is measured at its end, the last one when the sprint was completed
+    moments = [min(datetime.combine(day + timedelta(days=1), datetime.min.time()), end) for day in days]
+    return (days, moments)
+
+
+def search_sprint_issues(sprint_ids):
+    # one combined query for every sprint, chunked to keep the jql short
+    chunks = [sprint_ids[first:first + page_size] for first in range(0, len(sprint_ids), page_size)]
+    with ThreadPoolExecutor(max_workers=page_workers) as executor:
+        return [issue_json for issues in executor.map(
+            lambda chunk: list(search_issues('Sprint in (' + ','.join(map(str, chunk)) + ')', history_fields,
+                                             'changelog')), chunks)
+                for issue_json in issues]
+
+
+def status_changes(issue_json):
+    """
+    Status before the first change and (moment, status) of every change, from the changelog.
+    """
+    initial_status = None
+    changes = []
+    for history in issue_json['changelog']['histories']:
+        for (from_status, to_status) in get_status_changes(history):
+            initial_status = initial_status or from_status
+            changes.append((to_datetime(history['created']), to_status))
+    return (initial_status or issue_json['fields']['status']['name'], changes)
+
+
+def sample_status_codes(initial_codes, change_issues, change_minutes, change_codes, sample_issues, sample_minutes):
+    """
+    Status code of sample_issues at sample_minutes: the last change of the issue at or before the moment, the initial
+    status without one. Issues are laid out one after another on a single time axis, one search serves all samples.
+    """
+    if change_issues.size == 0 or sample_issues.size == 0:
+        return initial_codes[sample_issues]
+    origin = min(change_minutes.min(), sample_minutes.min())
+    span = max(change_minutes.max(), sample_minutes.max()) - origin + 1
+    order = np.lexsort((change_minutes, change_issues))
+    change_issues = change_issues[order]
+    change_keys = change_issues * span + (change_minutes[order] - origin)
+    positions = np.searchsorted(change_keys, sample_issues * span + (sample_minutes - origin), side='right') - 1
+    clipped = np.maximum(positions, 0)
+    changed = (positions >= 0) & (change_issues[clipped] == sample_issues)
+    return np.where(changed, change_codes[order][clipped], initial_codes[sample_issues])
+
+
+def build_burndowns(sprints_json, issues_json):
+    """
+    Daily open, in progress and done story points of every sprint in one pass over the status changes of all issues.
+    Issues belong to the sprints named in their sprint field and count with their current story points,
+    scope changes during a sprint are not replayed.
+    """
+    sprint_indexes = {sprint_json['id']: index for (index, sprint_json) in enumerate(sprints_json)}
+    initial_codes = []
+    story_points = []
+    change_issues = []
+    change_minutes = []
+    change_codes = []
+    pair_issues = []
+    pair_sprints = []
+    for (issue_index, issue_json) in enumerate(issues_json):
+        (initial_status, changes) = status_changes(issue_json)
+        initial_codes.append(status_code(initial_status))
+        story_points.append(issue_json['fields'].get('customfield_10002') or 0.0)
+        change_issues.extend([issue_index] * len(changes))
+        change_minutes.extend(moment for (moment, status) in changes)
+        change_codes.extend(status_code(status) for (moment, status) in changes)
+        for sprint_id in get_sprint_ids(issue_json['fields']) or ():
+            if sprint_id in sprint_indexes:
+                pair_issues.append(issue_index)
+                pair_sprints.append(sprint_indexes[sprint_id])
+    sprints_days = list(map(get_sprint_days, sprints_json))
+    day_counts = np.array([len(days) for (days, moments) in sprints_days], dtype=np.int64)
+    # sprint days are numbered one after another, slot_offsets[sprint] is the first day of a sprint
+    slot_offsets = np.concatenate([[0], np.cumsum(day_counts)])
+    slot_minutes = to_minutes([moment for (days, moments) in sprints_days for moment in moments])
+    pair_issues = np.array(pair_issues, dtype=np.int64)
+    pair_sprints = np.array(pair_sprints, dtype=np.int64)
+    # one sample per sprint issue and sprint day
+    pair_days = day_counts[pair_sprints]
+    sample_pairs = np.repeat(np.arange(pair_issues.size), pair_days)
+    sample_slots = slot_offsets[pair_sprints][sample_pairs] + (
+        np.arange(sample_pairs.size) - np.repeat(np.cumsum(pair_days) - pair_days, pair_days))
+    sample_issues = pair_issues[sample_pairs]
+    codes = sample_status_codes(np.array(initial_codes, dtype=np.int64), np.array(change_issues, dtype=np.int64),
+                                to_minutes(change_minutes), np.array(change_codes, dtype=np.int64),
+                                sample_issues, slot_minutes[sample_slots])
+    slot_points = np.zeros((slot_minutes.size, 3))
+    np.add.at(slot_points, (sample_slots, codes), np.array(story_points, dtype=np.float64)[sample_issues])
+    return [SprintBurndown(sprint_json['id'], sprint_json['name'], sprint_json['startDate'], sprint_json['endDate'],
+                           list(map(str, days)), *map(lambda code: slot_points[slot_offsets[index]:slot_offsets[index + 1],
+                                                                                 code].tolist(),
+                                                      (open_code, in_progress_code, done_code)))
+            for (index, (sprint_json, (days, moments))) in enumerate(zip(sprints_json, sprints_days))]
+
+
+def get_burndowns(sprints_json):
+    burndowns = dict(map(lambda sprint_json: (sprint_json['id'], load_burndown(sprint_json['id'])), sprints_json))
+    # a sprint shared by boards is built once
+    missing_sprints = list({sprint_json['id']: sprint_json for sprint_json in sprints_json
+                            if burndowns[sprint_json['id']] is None}.values())
+    if missing_sprints:
+        for burndown in build_burndowns(missing_sprints,
+                                        search_sprint_issues([sprint_json['id'] for sprint_json in missing_sprints])):
+            save_burndown(burndown)
+            burndowns[burndown.sprint_id] = burndown
+    return [burndowns[sprint_json['id']] for sprint_json in sprints_json]
+
+
+def get_boards_burndowns(board_ids, last=last_sprints):
+    """
+    Burndowns of the last closed sprints of every board: the sprint lists are read concurrently, the sprints not
+    stored yet are built together from one combined issue search.
+    """
+    with ThreadPoolExecutor(max_workers=max(len(board_ids), 1)) as executor:
+        boards_sprints = list(executor.map(lambda board_id: get_closed_sprints(board_id, last), board_ids))
+    burndowns = iter(get_burndowns([sprint_json for sprints_json in boards_sprints for sprint_json in sprints_json]))
+    return [(board_id, [next(burndowns) for _ in sprints_json]) for (board_id, sprints_json) in zip(board_ids, boards_sprints)]
+
+
+def to_velocity(board_id, burndown):
+    # every sprint issue is open, in progress or done on each day, the first day holds the whole scope
+    if not burndown.days:
+        return SprintVelocity(board_id, burndown.sprint_id, burndown.name, burndown.start_date, burndown.end_date, 0, 0)
+    return SprintVelocity(board_id, burndown.sprint_id, burndown.name, burndown.start_date, burndown.end_date,
+                          burndown.open_sp[0] + burndown.in_progress_sp[0] + burndown.done_sp[0], burndown.done_sp[-1])
+
+
+def get_velocity(board_ids, last=last_sprints):
+    return [to_velocity(board_id, burndown)
+            for (board_id, burndowns) in get_boards_burndowns(board_ids, last) for burndown in burndowns]
+
+
+def to_burndown_days(board_id, burndown):
+    return map(lambda day: BurndownDay(board_id, burndown.sprint_id, burndown.name, *day),
+               zip(burndown.days, burndown.open_sp, burndown.in_progress_sp, burndown.done_sp))
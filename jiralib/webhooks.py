@@ -0,0 +1,58 @@
+import re
+from datetime import datetime, timezone
+
+import jira_connector
+
+# the greenhopper sprint custom field, its id differs between jira instances
+sprint_field = jira_connector.settings.get("webhook", "sprint_field", fallback='customfield_10004')
+# older jira servers send sprints as 'com.atlassian.greenhopper.service.sprint.Sprint@1f[id=7,rapidViewId=1,...]'
+sprint_id_pattern = re.compile(r'[\[,]id=(\d+)')
+
+issue_deleted = 'jira:issue_deleted'
+
+
+def get_sprint_ids(fields):
+    if sprint_field not in fields:
+        return None
+    sprint_ids = set()
+    for sprint in fields[sprint_field] or []:
+        if isinstance(sprint, dict):
+            sprint_ids.add(int(sprint['id']))
+        else:
+            sprint_ids.update(map(int, sprint_id_pattern.findall(sprint)))
+    return sprint_ids
+
+
+def to_history(event):
+    # the changelog of the event is the history jira adds to the issue, dated like search results
+    changelog = event.get('changelog')
+    if not changelog or not changelog.get('items'):
+        return None
+    created = datetime.fromtimestamp(event.get('timestamp', 0) / 1000, timezone.utc)
+    return {'id': changelog.get('id'), 'created': created.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0000',
+            'items': changelog['items']}
+
+
+def apply_event(sprints, event):
+    """
+    Applies a jira issue created, updated or deleted webhook event to the sprints kept in memory and returns the ones
+    that changed. The issue moves between sprints by the sprint field, without the field it stays where it is.
+    """
+    issue_json = event['issue']
+    key = issue_json['key']
+    if event.get('webhookEvent') == issue_deleted:
+        return [sprint for sprint in sprints if sprint.remove_issue(key)]
+    sprint_ids = get_sprint_ids(issue_json.get('fields', {}))
+    history = to_history(event)
+    changed_sprints = []
+    for sprint in sprints:
+        if sprint_ids is None:
+            in_sprint = key in sprint.issues_by_key
+        else:
+            in_sprint = sprint.get_id() in sprint_ids
+        if in_sprint:
+            sprint.put_issue(issue_json, history)
+            changed_sprints.append(sprint)
+        elif sprint.remove_issue(key):
+            changed_sprints.append(sprint)
+    return changed_sprints
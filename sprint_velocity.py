@@ -0,0 +1,14 @@
+from itertools import chain
+
+import jira_connector
+from jiralib.namedtuple_printer import write_csv
+from jiralib.sprint_history import BurndownDay, SprintVelocity, get_boards_burndowns, to_burndown_days, to_velocity
+
+# velocity and daily burndown of the last closed sprints of the monitored boards
+boards = jira_connector.settings.get("monitoring", "boards", fallback='1,93,97,5,87,103').replace(' ', '').split(',')
+
+boards_burndowns = get_boards_burndowns(boards)
+write_csv('velocity.csv', SprintVelocity,
+          [to_velocity(board_id, burndown) for (board_id, burndowns) in boards_burndowns for burndown in burndowns])
+write_csv('burndown.csv', BurndownDay, chain.from_iterable(
+    to_burndown_days(board_id, burndown) for (board_id, burndowns) in boards_burndowns for burndown in burndowns))
@@ -1,16 +1,28 @@
-from jiralib.sprint import get_first_active_sprint
+import sys
 
+import jira_connector
+from jiralib.sprint import get_first_active_sprints
 
-def print_board_stats(id):
-    try:
-        sprint = get_first_active_sprint(id)
-        sprint.print_stats()
-    except Exception:
-        print('Error during board '+ id + ' showing')
 
-boards = ['1','93','97', '5', '87', '103']
+def print_board_stats(board_sprint):
+    if board_sprint.error is None:
+        try:
+            board_sprint.sprint.print_stats()
+            return
+        except Exception:
+            pass
+    print('Error during board '+ board_sprint.board_id + ' showing')
 
-for board_id in boards:
-    print_board_stats(board_id)
-    print('')
-    print('')
\ No newline at end of file
+boards = jira_connector.settings.get("monitoring", "boards", fallback='1,93,97,5,87,103').replace(' ', '').split(',')
+
+if '--serve' in sys.argv:
+    # service mode: sprints stay in memory, refreshed on a schedule and shown on a local dashboard
+    from jiralib.monitoring_service import MonitoringService
+    MonitoringService(boards).serve()
+else:
+    for board_sprint in get_first_active_sprints(boards):
+        print_board_stats(board_sprint)
+        print('')
+        print('')
+
+    jira_connector.print_http_cache_stats()
@@ -0,0 +1,4 @@
+import os
+
+# jira_connector reads jira.ini from the working directory when jiralib is imported
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
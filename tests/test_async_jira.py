@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from jira.exceptions import JIRAError
+
+from jiralib.async_jira import AsyncJira
+from jiralib.sprint import get_first_active_sprints_async
+
+# the stub applies its own page size like jira does, whatever maxResults asks for
+server_page_size = 7
+
+
+def to_issue_json(number, sprint_id):
+    status = ('To Do', 'blue-gray') if number % 3 == 0 else ('Done', 'green')
+    return {'key': 'CFD-' + str(number), 'id': str(number),
+            'fields': {'summary': 'Issue ' + str(number), 'status': {'name': status[0],
+                                                                     'statusCategory': {'colorName': status[1]}},
+                       'assignee': None, 'issuetype': {'name': 'Task'}, 'project': {'key': 'CFD', 'name': 'CFD'},
+                       'customfield_10002': 1.0, 'issuelinks': [], 'subtasks': [], 'duedate': None,
+                       'resolutiondate': None, 'sprint_id': sprint_id},
+            'changelog': {'histories': []}}
+
+
+class StubJira:
+    def __init__(self):
+        self.issues = [to_issue_json(number, 10 + number % 2) for number in range(1, 24)]
+        self.boards = [{'id': board_id, 'name': 'Board ' + str(board_id), 'type': 'scrum'} for board_id in range(1, 6)]
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def track(self, request):
+        self.requests.append((request.path, dict(request.query)))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # gives concurrent requests the time to overlap
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+    async def search(self, request):
+        await self.track(request)
+        jql = request.query['jql']
+        issues = self.issues
+        if jql.startswith('Sprint = '):
+            issues = [issue for issue in issues if issue['fields']['sprint_id'] == int(jql[len('Sprint = '):])]
+        start_at = int(request.query['startAt'])
+        max_results = min(int(request.query['maxResults']), server_page_size)
+        return web.json_response({'startAt': start_at, 'maxResults': max_results, 'total': len(issues),
+                                  'issues': issues[start_at:start_at + max_results]})
+
+    async def issue(self, request):
+        await self.track(request)
+        for issue in self.issues:
+            if issue['key'] == request.match_info['key']:
+                return web.json_response(issue)
+        return web.json_response({'errorMessages': ['Issue Does Not Exist']}, status=404)
+
+    def values_page(self, values, request, page_size=2):
+        start_at = int(request.query.get('startAt', 0))
+        return web.json_response({'startAt': start_at, 'maxResults': page_size,
+                                  'isLast': start_at + page_size >= len(values),
+                                  'values': values[start_at:start_at + page_size]})
+
+    async def board_list(self, request):
+        await self.track(request)
+        return self.values_page(self.boards, request)
+
+    async def sprint_list(self, request):
+        await self.track(request)
+        board_id = int(request.match_info['board_id'])
+        sprint = {'id': 10 + board_id % 2, 'name': 'Sprint ' + str(board_id), 'state': request.query['state'],
+                  'originBoardId': board_id,
+                  'startDate': '2026-10-05T09:00:00.000Z', 'endDate': '2026-10-19T09:00:00.000Z'}
+        return self.values_page([sprint], request)
+
+    def to_app(self):
+        app = web.Application()
+        app.router.add_get('/rest/api/2/search', self.search)
+        app.router.add_get('/rest/api/2/issue/{key}', self.issue)
+        app.router.add_get('/rest/agile/1.0/board', self.board_list)
+        app.router.add_get('/rest/agile/1.0/board/{board_id}/sprint', self.sprint_list)
+        return app
+
+
+def run_against_stub(test, max_connections=3):
+    stub = StubJira()
+
+    async def run():
+        runner = web.AppRunner(stub.to_app())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        try:
+            server = 'http://127.0.0.1:' + str(runner.addresses[0][1])
+            async with AsyncJira(server, ('login', 'password'), max_connections=max_connections) as jira:
+                return await test(jira)
+        finally:
+            await runner.cleanup()
+
+    return (stub, asyncio.run(run()))
+
+
+def test_search_issues_reads_every_page_in_order():
+    (stub, issues) = run_against_stub(lambda jira: jira.search_issues('project = CFD', ['summary'], 'changelog', 100))
+    assert [issue['key'] for issue in issues] == ['CFD-' + str(number) for number in range(1, 24)]
+    searches = [query for (path, query) in stub.requests if path == '/rest/api/2/search']
+    assert sorted(int(query['startAt']) for query in searches) == [0, 7, 14, 21]
+    # pages after the first ask for the page size the server applied
+    assert {query['maxResults'] for query in searches[1:]} == {str(server_page_size)}
+    assert {(query['fields'], query['expand']) for query in searches} == {('summary', 'changelog')}
+    assert stub.max_in_flight <= 3
+
+
+def test_boards_and_sprints_follow_agile_paging():
+    async def read(jira):
+        return (await jira.boards(), await jira.sprints(4, state='active'))
+
+    (stub, (boards, sprints)) = run_against_stub(read)
+    assert [board['id'] for board in boards] == [1, 2, 3, 4, 5]
+    assert [query['startAt'] for (path, query) in stub.requests if path == '/rest/agile/1.0/board'] == ['0', '2', '4']
+    assert [(sprint['id'], sprint['state']) for sprint in sprints] == [(10, 'active')]
+
+
+def test_errors_are_raised_as_jira_errors():
+    async def read(jira):
+        assert (await jira.issue('CFD-3'))['key'] == 'CFD-3'
+        return await jira.issue('CFD-99')
+
+    with pytest.raises(JIRAError) as error:
+        run_against_stub(read)
+    assert error.value.status_code == 404
+
+
+def test_active_sprints_of_every_board_are_fetched_concurrently():
+    (stub, board_sprints) = run_against_stub(
+        lambda jira: get_first_active_sprints_async(['1', '2', '3', '4', '5'], jira=jira), max_connections=4)
+    assert [board_sprint.error for board_sprint in board_sprints] == [None] * 5
+    assert [board_sprint.sprint.board_name for board_sprint in board_sprints] == ['Board 1', 'Board 2', 'Board 3',
+                                                                                  'Board 4', 'Board 5']
+    # odd boards hold the 12 odd issues, even boards the 11 even ones, the multiples of 3 are still open
+    assert [board_sprint.sprint.total_sp() for board_sprint in board_sprints] == [12.0, 11.0, 12.0, 11.0, 12.0]
+    assert [board_sprint.sprint.open_sp() for board_sprint in board_sprints] == [4.0, 3.0, 4.0, 3.0, 4.0]
+    assert 1 < stub.max_in_flight <= 4
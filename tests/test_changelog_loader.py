@@ -0,0 +1,81 @@
+import threading
+
+from jiralib.changelog_loader import ChangelogLoader
+
+
+def to_issue_json(number):
+    return {'key': 'CFD-' + str(number), 'id': str(number),
+            'fields': {'summary': 'Issue ' + str(number), 'status': {'name': 'Done'}, 'assignee': {'name': 'dev'}}}
+
+
+def to_changelog_json(key):
+    return {'key': key, 'changelog': {'histories': [
+        {'created': '2026-10-12T10:00:00.000+0000',
+         'items': [{'field': 'status', 'fromString': 'To Do', 'toString': 'In Progress'}]}]}}
+
+
+class StubChangelogs:
+    def __init__(self, missing_keys=()):
+        self.missing_keys = set(missing_keys)
+        self.fetched_chunks = []
+
+    def __call__(self, keys):
+        self.fetched_chunks.append(list(keys))
+        return [to_changelog_json(key) for key in keys if key not in self.missing_keys]
+
+
+def test_streamed_issues_are_loaded_chunk_by_chunk():
+    changelogs = StubChangelogs(missing_keys=['CFD-7'])
+    loader = ChangelogLoader(changelogs, workers=1, chunk_size=10)
+    starts = [issue.get_work_start_date() for issue in loader.wrap_all(map(to_issue_json, range(25)))]
+    assert [len(chunk) for chunk in changelogs.fetched_chunks] == [10, 10, 5]
+    assert starts[7] is None
+    assert len([start for start in starts if start is not None]) == 24
+
+
+def test_other_chunks_load_while_a_fetch_is_running():
+    fetch_started = threading.Event()
+    release_fetch = threading.Event()
+
+    def slow_fetch(keys):
+        if 'CFD-0' in keys:
+            fetch_started.set()
+            release_fetch.wait(5)
+        return [to_changelog_json(key) for key in keys]
+
+    loader = ChangelogLoader(slow_fetch, workers=1, chunk_size=10)
+    first_issues = list(map(loader.wrap, map(to_issue_json, range(3))))
+    first_reader = threading.Thread(target=first_issues[0].get_timeline)
+    first_reader.start()
+    assert fetch_started.wait(5)
+    # wrapping and loading other issues does not wait for the running fetch
+    other_issue = loader.wrap(to_issue_json(10))
+    assert other_issue.get_work_start_date() is not None
+    # an issue of the running fetch waits for it instead of fetching again
+    second_reader = threading.Thread(target=first_issues[1].get_timeline)
+    second_reader.start()
+    second_reader.join(0.2)
+    assert second_reader.is_alive()
+    release_fetch.set()
+    first_reader.join(5)
+    second_reader.join(5)
+    assert all(issue.get_work_start_date() is not None for issue in first_issues)
+
+
+def test_failed_fetch_is_tried_again():
+    attempts = []
+
+    def failing_once(keys):
+        attempts.append(keys)
+        if len(attempts) == 1:
+            raise ConnectionError('jira is down')
+        return [to_changelog_json(key) for key in keys]
+
+    loader = ChangelogLoader(failing_once, workers=1)
+    issue = loader.wrap(to_issue_json(1))
+    try:
+        issue.get_timeline()
+    except ConnectionError:
+        pass
+    assert issue.get_work_start_date() is not None
+    assert len(attempts) == 2
@@ -0,0 +1,113 @@
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+from jira.exceptions import JIRAError
+
+from jiralib.http_session import AdaptiveLimit, ThrottledSession, get_retry_after
+
+
+def to_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b'{}'
+    return response
+
+
+class StubSession:
+    """
+    Answers with the queued responses in turn, raising for errors like the jira client session does.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def get(self, url, **kwargs):
+        self.sent.append(time.monotonic())
+        response = self.responses.pop(0)
+        if response.status_code >= 400:
+            raise JIRAError(status_code=response.status_code, url=url, response=response)
+        return response
+
+
+def test_throttled_request_waits_for_retry_after():
+    session = StubSession(to_response(429, {'Retry-After': '0.3'}), to_response(200))
+    limit = AdaptiveLimit(initial=4)
+    throttled_session = ThrottledSession(session, limit, max_retries=3, backoff_seconds=10)
+    response = throttled_session.get('https://jira/rest/api/2/search')
+    assert response.status_code == 200
+    assert session.sent[1] - session.sent[0] >= 0.3
+    stats = throttled_session.stats()
+    assert (stats.requests, stats.retries, stats.overloaded) == (1, 1, 1)
+    assert limit.limit < 4
+
+
+def test_retry_after_pauses_other_requests():
+    limit = AdaptiveLimit(initial=4)
+    limit.pause(0.3)
+    started = time.monotonic()
+    waiter = threading.Thread(target=limit.acquire)
+    waiter.start()
+    waiter.join()
+    assert time.monotonic() - started >= 0.3
+
+
+def test_overloaded_requests_are_given_up_after_max_retries():
+    session = StubSession(*[to_response(503) for _ in range(3)])
+    throttled_session = ThrottledSession(session, AdaptiveLimit(), max_retries=2, backoff_seconds=0.01)
+    with pytest.raises(JIRAError) as error:
+        throttled_session.get('https://jira/rest/api/2/search')
+    assert error.value.status_code == 503
+    assert len(session.sent) == 3
+    assert throttled_session.stats().retries == 2
+
+
+def test_client_errors_are_not_retried():
+    session = StubSession(to_response(404), to_response(200))
+    throttled_session = ThrottledSession(session, AdaptiveLimit(), max_retries=3, backoff_seconds=0.01)
+    with pytest.raises(JIRAError):
+        throttled_session.get('https://jira/rest/api/2/issue/CFD-1')
+    assert len(session.sent) == 1
+
+
+def test_limit_grows_by_about_one_per_round_trip():
+    limit = AdaptiveLimit(initial=4, maximum=16)
+    for _ in range(4):
+        limit.acquire()
+    for _ in range(4):
+        limit.release(0.1, endpoint='search')
+    assert 4.9 < limit.limit < 5.0
+
+
+def test_overloaded_round_trip_halves_the_limit_once():
+    limit = AdaptiveLimit(initial=8, minimum=1)
+    for _ in range(8):
+        limit.acquire()
+    for _ in range(8):
+        limit.release(1.0, overloaded=True, endpoint='search')
+    assert limit.limit == 4
+
+
+def test_slow_answers_stop_the_growth_without_cutting_the_limit():
+    limit = AdaptiveLimit(initial=4, slow_factor=3.0)
+    limit.acquire()
+    limit.release(0.5, endpoint='search')
+    grown = limit.limit
+    for _ in range(20):
+        limit.acquire()
+        limit.release(10.0, endpoint='search')
+    assert limit.limit == grown
+    # a slow endpoint is only compared with itself
+    limit.acquire()
+    limit.release(8.0, endpoint='changelog search')
+    assert limit.limit > grown
+
+
+def test_retry_after_formats():
+    assert get_retry_after(to_response(429, {'Retry-After': '2'})) == 2.0
+    assert 9 <= get_retry_after(to_response(429, {'Retry-After': formatdate(time.time() + 10, usegmt=True)})) <= 10
+    assert get_retry_after(to_response(429)) is None
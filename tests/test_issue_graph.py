@@ -0,0 +1,38 @@
+from jiralib.issue_graph import IssueGraph, to_components
+from jiralib.jira_issue_wrapper import JiraIssueWrapper
+
+
+def to_graph(remaining_mds, dependencies=(), children=()):
+    # issues already estimated, the graph never asks jira or the capacity calculator
+    graph = IssueGraph(capacity_calculator=object())
+    for (key, remaining_md) in remaining_mds.items():
+        issue = JiraIssueWrapper({'key': key, 'fields': {'summary': key, 'issuetype': {'name': 'Task'}}})
+        issue.remaining_md = remaining_md
+        graph.issues[key] = issue
+        graph.estimated.add(key)
+    for (from_key, to_key) in dependencies:
+        graph.add_edge(graph.successors, graph.predecessors, from_key, to_key)
+    for (parent_key, child_key) in children:
+        graph.add_edge(graph.children, graph.parents, parent_key, child_key)
+    return graph
+
+
+def test_issues_finish_after_what_they_wait_for():
+    graph = to_graph({'A': 2, 'B': 3, 'C': 1, 'E': 0}, dependencies=[('A', 'B'), ('B', 'C')], children=[('E', 'A')])
+    (finish_days, longest_waits) = graph.finish_days()
+    assert finish_days == {'A': 2, 'B': 5, 'C': 6, 'E': 2}
+    assert graph.critical_path() == ('A B C'.split(), 6)
+
+
+def test_issue_downstream_of_a_cycle_waits_for_the_cycle():
+    # X and Y depend on each other, B depends on X and must not be taken as the start of the cycle
+    graph = to_graph({'B': 1, 'X': 5, 'Y': 3}, dependencies=[('X', 'Y'), ('Y', 'X'), ('X', 'B')])
+    (finish_days, longest_waits) = graph.finish_days()
+    assert finish_days == {'X': 5, 'Y': 8, 'B': 6}
+    assert longest_waits['B'] == 'X'
+
+
+def test_components_group_the_keys_of_a_cycle():
+    next_keys = {'A': {'B'}, 'B': {'C'}, 'C': {'A', 'D'}, 'D': set()}
+    components = to_components(next_keys, next_keys.get)
+    assert components['A'] == components['B'] == components['C'] != components['D']
@@ -0,0 +1,144 @@
+import os
+import re
+import threading
+from datetime import datetime
+
+import pytest
+
+from jiralib import jira_queries
+from jiralib.issue_store import IssueStore, project_issue
+
+jql = 'project = CFD ORDER BY key'
+
+
+def to_issue_json(key, updated, summary='first'):
+    return {'key': key, 'id': key[len('CFD-'):],
+            'fields': {'summary': summary, 'status': {'name': 'Open'}, 'updated': updated},
+            'changelog': {'histories': []}}
+
+
+class StubJira:
+    """
+    Answers the searches of the store from a list of issues: the query itself, its updated >= delta and key lists.
+    """
+
+    def __init__(self, issues):
+        self.issues = {issue['key']: issue for issue in issues}
+        self.query_keys = list(self.issues)
+        self.searches = []
+
+    def put(self, issue_json):
+        self.issues[issue_json['key']] = issue_json
+
+    def fetch_issues(self, search_jql):
+        self.searches.append(search_jql)
+        if search_jql.startswith('key in ('):
+            keys = search_jql[len('key in ('):-1].split(',')
+            return iter([self.issues[key] for key in keys if key in self.issues])
+        delta = re.search(r' AND updated >= "([^"]+)"$', search_jql)
+        keys = self.query_keys
+        if delta is not None:
+            since = datetime.strptime(delta.group(1), '%Y/%m/%d %H:%M').strftime('%Y-%m-%dT%H:%M')
+            keys = [key for key in keys if self.issues[key]['fields']['updated'][:16] >= since]
+        return iter([self.issues[key] for key in keys])
+
+    def fetch_keys(self, search_jql):
+        self.searches.append('keys ' + search_jql)
+        return iter(self.query_keys)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return os.path.join(str(tmp_path), 'store', 'issues.sqlite')
+
+
+def search(store, jira):
+    return list(store.search(jql, jira.fetch_issues, jira.fetch_keys))
+
+
+def test_full_sync_stores_the_query_and_serves_it_while_fresh(store_path):
+    jira = StubJira([to_issue_json('CFD-1', '2026-10-12T10:00:00.000+0000'),
+                     to_issue_json('CFD-2', '2026-10-14T09:30:00.000+0000')])
+    store = IssueStore(store_path, max_age_minutes=30)
+    assert [issue['key'] for issue in search(store, jira)] == ['CFD-1', 'CFD-2']
+    assert jira.searches == [jql]
+    assert store.get_sync_state(jql).watermark == '2026-10-14T09:30:00.000+0000'
+    reopened_store = IssueStore(store_path, max_age_minutes=30)
+    assert search(reopened_store, jira) == search(store, jira)
+    assert jira.searches == [jql]
+    assert store.is_fresh(jql)
+
+
+def test_delta_sync_downloads_issues_updated_since_the_watermark(store_path):
+    jira = StubJira([to_issue_json('CFD-1', '2026-10-01T10:00:00.000+0000'),
+                     to_issue_json('CFD-2', '2026-10-14T09:30:00.000+0000')])
+    store = IssueStore(store_path, max_age_minutes=0, overlap_minutes=60)
+    search(store, jira)
+    jira.put(to_issue_json('CFD-2', '2026-10-15T08:00:00.000+0000', 'second'))
+    jira.searches = []
+    issues = search(store, jira)
+    assert jira.searches == ['(' + jql + ') AND updated >= "2026/10/14 08:30"', 'keys ' + jql]
+    assert [(issue['key'], issue['fields']['summary']) for issue in issues] == [('CFD-1', 'first'),
+                                                                               ('CFD-2', 'second')]
+    assert store.get_sync_state(jql).watermark == '2026-10-15T08:00:00.000+0000'
+
+
+def test_membership_refresh_picks_up_issues_joining_and_leaving_without_updates(store_path):
+    jira = StubJira([to_issue_json('CFD-1', '2026-10-01T10:00:00.000+0000'),
+                     to_issue_json('CFD-2', '2026-10-14T09:30:00.000+0000'),
+                     to_issue_json('CFD-3', '2026-09-01T10:00:00.000+0000')])
+    jira.query_keys = ['CFD-1', 'CFD-2']
+    store = IssueStore(store_path, max_age_minutes=0, overlap_minutes=60)
+    search(store, jira)
+    # CFD-3 joins and CFD-1 leaves the query, e.g. moved between sprints, neither is updated after the watermark
+    jira.query_keys = ['CFD-2', 'CFD-3']
+    jira.searches = []
+    assert [issue['key'] for issue in search(store, jira)] == ['CFD-2', 'CFD-3']
+    assert jira.searches[-1] == 'key in (CFD-3)'
+
+
+def test_stored_issues_are_projected_like_search_results(store_path):
+    jira = StubJira([to_issue_json('CFD-1', '2026-10-01T10:00:00.000+0000')])
+    store = IssueStore(store_path)
+    (issue_json,) = search(store, jira)
+    assert project_issue(issue_json, ['summary', 'duedate'], None) == {'key': 'CFD-1', 'id': '1',
+                                                                       'fields': {'summary': 'first'}}
+    assert project_issue(issue_json, 'summary,status', 'changelog')['changelog'] == {'histories': []}
+    assert project_issue(issue_json)['fields'] == issue_json['fields']
+    assert [issue['key'] for issue in store.get_issues(['CFD-1', 'CFD-9'])] == ['CFD-1']
+
+
+def to_started_issue_json(key):
+    issue_json = to_issue_json(key, '2026-10-12T10:00:00.000+0000')
+    issue_json['fields']['assignee'] = {'name': 'dev'}
+    issue_json['changelog'] = {'histories': [
+        {'created': '2026-10-12T10:00:00.000+0000',
+         'items': [{'field': 'status', 'fromString': 'To Do', 'toString': 'In Progress'}]}]}
+    return issue_json
+
+
+def test_lazy_changelogs_are_read_from_the_sync_still_streaming(store_path, monkeypatch):
+    jira = StubJira(list(map(to_started_issue_json, ['CFD-1', 'CFD-2', 'CFD-3'])))
+    monkeypatch.setattr(jira_queries, 'issue_store', IssueStore(store_path))
+    monkeypatch.setattr(jira_queries, 'fetch_issues', lambda search_jql, *args, **kwargs: jira.fetch_issues(search_jql))
+    monkeypatch.setattr(jira_queries, 'fetch_keys', jira.fetch_keys)
+    issues = jira_queries.search_wrapped_issues(jql, compact=False, lazy=True)
+    # nothing is committed yet, the syncing thread reads its own rows
+    assert all(issue.get_work_start_date() is not None for issue in issues)
+    assert jira.searches == [jql]
+
+
+def test_changelogs_missing_from_the_store_are_downloaded(store_path, monkeypatch):
+    jira = StubJira(list(map(to_started_issue_json, ['CFD-1', 'CFD-2'])))
+    monkeypatch.setattr(jira_queries, 'issue_store', IssueStore(store_path))
+    monkeypatch.setattr(jira_queries, 'fetch_issues', lambda search_jql, *args, **kwargs: jira.fetch_issues(search_jql))
+    monkeypatch.setattr(jira_queries, 'fetch_keys', jira.fetch_keys)
+    issues = jira_queries.search_issues(jql)
+    next(issues)
+    # another thread does not see the rows of a sync that is not committed yet
+    fetched = []
+    other_thread = threading.Thread(target=lambda: fetched.extend(jira_queries.fetch_stored_changelogs(['CFD-1'])))
+    other_thread.start()
+    other_thread.join(5)
+    assert [issue_json['key'] for issue_json in fetched] == ['CFD-1']
+    assert jira.searches == [jql, 'key in (CFD-1)']
@@ -0,0 +1,103 @@
+import json
+import os
+import zipfile
+
+import pytest
+import requests
+
+from jiralib.http_session import RecordingSession, ReplayMissError, ReplaySession
+
+base_url = 'https://jira.internal-services.com'
+search_url = base_url + '/rest/api/2/search'
+
+
+class StubSession:
+    """
+    The jira client session: answers every request with a numbered json body and counts what was sent.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append((method, url, kwargs))
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response.encoding = 'utf-8'
+        response.headers.update({'Content-Type': 'application/json', 'ETag': '"' + str(len(self.sent)) + '"',
+                                 'X-Request-Id': 'not recorded'})
+        response._content = json.dumps({'answer': len(self.sent), 'issues': []}).encode('utf-8')
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+@pytest.fixture
+def fixtures_file(tmp_path):
+    return os.path.join(str(tmp_path), 'fixtures', 'jira.zip')
+
+
+def record(fixtures_file, *requests_to_send):
+    session = StubSession()
+    recording_session = RecordingSession(session, fixtures_file, base_url)
+    try:
+        responses = [recording_session.request(method, url, **kwargs) for (method, url, kwargs) in requests_to_send]
+    finally:
+        recording_session.close()
+    return (session, responses)
+
+
+def test_replay_answers_recorded_requests_without_the_network(fixtures_file):
+    (session, responses) = record(
+        fixtures_file,
+        ('GET', search_url, {'params': {'jql': 'project = CFD', 'startAt': 0, 'maxResults': 100}}),
+        ('POST', base_url + '/rest/api/2/issue', {'json': {'fields': {'summary': 'New', 'project': {'key': 'CFD'}}}}))
+    replay_session = ReplaySession(StubSession(), fixtures_file, base_url)
+    replayed = replay_session.get(search_url, params={'jql': 'project = CFD', 'startAt': 0, 'maxResults': 100})
+    assert (replayed.status_code, replayed.json(), replayed.url) == (200, responses[0].json(), responses[0].url)
+    assert replayed.headers['ETag'] == '"1"'
+    assert 'X-Request-Id' not in replayed.headers
+    created = replay_session.post(base_url + '/rest/api/2/issue',
+                                  json={'fields': {'summary': 'New', 'project': {'key': 'CFD'}}})
+    assert created.json()['answer'] == 2
+    assert replay_session.session.sent == []
+
+
+def test_same_request_with_other_param_order_body_order_or_auth_is_one_entry(fixtures_file):
+    (session, responses) = record(
+        fixtures_file,
+        ('GET', search_url, {'params': {'jql': 'project = CFD', 'startAt': 0}, 'auth': ('login', 'password')}),
+        ('GET', search_url, {'params': {'startAt': 0, 'jql': 'project = CFD'}, 'auth': ('other', 'secret')}),
+        ('POST', base_url + '/rest/api/2/issue', {'data': '{"fields": {"summary": "New", "priority": "Major"}}'}),
+        ('POST', base_url + '/rest/api/2/issue', {'json': {'fields': {'priority': 'Major', 'summary': 'New'}}}))
+    with zipfile.ZipFile(fixtures_file) as archive:
+        assert len(archive.namelist()) == 2
+    replay_session = ReplaySession(StubSession(), fixtures_file, base_url)
+    replayed = replay_session.get(search_url, params={'startAt': 0, 'jql': 'project = CFD'}, auth=('third', 'user'))
+    assert replayed.json()['answer'] == 1
+    # a relative url of the same request is the same entry too
+    assert replay_session.get('/rest/api/2/search', params={'jql': 'project = CFD', 'startAt': 0}).json()['answer'] == 1
+
+
+def test_recording_again_keeps_the_first_answer(fixtures_file):
+    record(fixtures_file, ('GET', search_url, {'params': {'jql': 'project = CFD'}}))
+    record(fixtures_file, ('GET', search_url, {'params': {'jql': 'project = CFD'}}))
+    replay_session = ReplaySession(StubSession(), fixtures_file, base_url)
+    assert replay_session.get(search_url, params={'jql': 'project = CFD'}).json()['answer'] == 1
+
+
+def test_replay_miss_raises(fixtures_file):
+    record(fixtures_file, ('GET', search_url, {'params': {'jql': 'project = CFD', 'startAt': 0}}))
+    replay_session = ReplaySession(StubSession(), fixtures_file, base_url)
+    with pytest.raises(ReplayMissError) as error:
+        replay_session.get(search_url, params={'jql': 'project = CFD', 'startAt': 100})
+    assert 'startAt' in str(error.value)
+    with pytest.raises(ReplayMissError):
+        replay_session.post(search_url, json={'jql': 'project = CFD'})
+    assert replay_session.session.sent == []
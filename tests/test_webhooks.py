@@ -0,0 +1,140 @@
+import copy
+import http.client
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from jiralib.jira_issue_wrapper import wrap_issue
+from jiralib.monitoring_service import MonitoringService, to_request_handler
+from jiralib.sprint import Sprint
+from jiralib.webhooks import apply_event
+
+fixtures_folder = os.path.join(os.path.dirname(__file__), 'fixtures', 'webhooks')
+
+sprint_json = {'id': 7, 'name': 'CFD Sprint 42', 'state': 'active', 'originBoardId': 1,
+               'startDate': '2026-10-05T09:00:00.000Z', 'endDate': '2026-10-19T09:00:00.000Z'}
+
+
+def load_payload(name):
+    with open(os.path.join(fixtures_folder, name + '.json'), encoding='utf-8') as payload_file:
+        return json.load(payload_file)
+
+
+def status(name, color):
+    return {'name': name, 'statusCategory': {'colorName': color}}
+
+
+def to_issue_json(key, status_json, story_points, updated, histories):
+    return {'key': key, 'id': key[len('CFD-'):],
+            'fields': {'summary': key, 'status': status_json, 'assignee': {'name': 'o.petrenko'},
+                       'issuetype': {'name': 'Task'}, 'project': {'key': 'CFD', 'name': 'Card Flow Development'},
+                       'customfield_10002': story_points, 'issuelinks': [], 'subtasks': [], 'duedate': None,
+                       'resolutiondate': None, 'updated': updated},
+            'changelog': {'histories': histories}}
+
+
+def to_history(created, from_status, to_status):
+    return {'created': created, 'items': [{'field': 'status', 'fromString': from_status, 'toString': to_status}]}
+
+
+def make_sprint():
+    issues = [
+        to_issue_json('CFD-101', status('In Progress', 'yellow'), 3.0, '2026-10-12T10:00:00.000+0000',
+                      [to_history('2026-10-12T10:00:00.000+0000', 'To Do', 'In Progress')]),
+        to_issue_json('CFD-102', status('To Do', 'blue-gray'), 2.0, '2026-10-05T09:00:00.000+0000', []),
+        to_issue_json('CFD-103', status('Done', 'green'), 8.0, '2026-10-09T16:00:00.000+0000',
+                      [to_history('2026-10-06T11:00:00.000+0000', 'To Do', 'In Progress'),
+                       to_history('2026-10-09T16:00:00.000+0000', 'In Progress', 'Done')]),
+    ]
+    return Sprint(sprint_json, 'Card Flow', list(map(wrap_issue, issues)))
+
+
+def test_updated_event_moves_issue_to_done():
+    sprint = make_sprint()
+    changed_sprints = apply_event([sprint], load_payload('issue_updated'))
+    assert changed_sprints == [sprint]
+    assert (sprint.open_sp(), sprint.in_progress_sp(), sprint.done_sp(), sprint.total_sp()) == (2.0, 0, 11.0, 13.0)
+    assert (sprint.snapshot.in_progress_count, sprint.snapshot.done_count) == (0, 2)
+    issue = sprint.issues_by_key['CFD-101']
+    assert issue.is_done()
+    assert str(issue.get_work_start_date()) == '2026-10-12 10:00:00'
+    assert str(issue.get_work_end_date()) == '2026-10-14 09:30:00'
+    assert len(issue.get_timeline().progress_ranges['all']) == 1
+
+
+def test_created_event_adds_issue_to_its_sprint():
+    sprint = make_sprint()
+    other_sprint = Sprint({**sprint_json, 'id': 8}, 'Card Flow', [])
+    changed_sprints = apply_event([sprint, other_sprint], load_payload('issue_created'))
+    assert changed_sprints == [sprint]
+    assert (sprint.open_sp(), sprint.total_sp(), sprint.snapshot.open_count) == (7.0, 18.0, 2)
+    assert sprint.snapshot.open_5_or_bigger_count == 1
+    assert other_sprint.sprint_issues == []
+
+
+def test_deleted_event_removes_issue():
+    sprint = make_sprint()
+    assert apply_event([sprint], load_payload('issue_deleted')) == [sprint]
+    assert 'CFD-102' not in sprint.issues_by_key
+    assert (sprint.open_sp(), sprint.total_sp(), sprint.snapshot.open_count) == (0, 11.0, 0)
+
+
+def test_issue_moved_to_another_sprint_leaves():
+    sprint = make_sprint()
+    event = load_payload('issue_updated')
+    event['issue']['fields']['customfield_10004'] = [{'id': 8, 'name': 'CFD Sprint 43', 'state': 'future'}]
+    assert apply_event([sprint], event) == [sprint]
+    assert 'CFD-101' not in sprint.issues_by_key
+    assert (sprint.in_progress_sp(), sprint.total_sp()) == (0, 10.0)
+
+
+def test_event_applied_twice_is_counted_once():
+    sprint = make_sprint()
+    event = load_payload('issue_updated')
+    apply_event([sprint], event)
+    apply_event([sprint], copy.deepcopy(event))
+    assert (sprint.done_sp(), sprint.total_sp()) == (11.0, 13.0)
+    assert len(sprint.issues_by_key['CFD-101'].get_timeline().progress_ranges['all']) == 1
+
+
+@pytest.fixture
+def service_address():
+    service = MonitoringService(['1'])
+    service.sprints['1'] = make_sprint()
+    service.pages = service.render_pages()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), to_request_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield (service, server.server_address)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def post(address, path, body):
+    connection = http.client.HTTPConnection(*address)
+    try:
+        connection.request('POST', path, body, {'Content-Type': 'application/json'})
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_posted_payload_patches_the_dashboard(service_address):
+    (service, address) = service_address
+    with open(os.path.join(fixtures_folder, 'issue_updated.json'), 'rb') as payload_file:
+        assert post(address, '/webhook', payload_file.read()) == 204
+    sprint = service.sprints['1']
+    assert (sprint.in_progress_sp(), sprint.done_sp()) == (0, 11.0)
+    (issue_row,) = [row for row in service.get_page('/board/1').split(b'<tr>') if b'>CFD-101<' in row]
+    assert b'>Done</span>' in issue_row
+
+
+def test_malformed_payload_is_rejected(service_address):
+    (service, address) = service_address
+    assert post(address, '/webhook', b'{"webhookEvent": "jira:issue_updated"') == 400
+    assert post(address, '/webhook', b'{"webhookEvent": "jira:issue_updated"}') == 400
+    assert service.sprints['1'].total_sp() == 13.0